@@ -1,11 +1,19 @@
 #!/bin/bash 
 
 # run the algo 100 times and plot clustering scores
+manifest=$(mktemp)
 for i in {1..100}
 do  
     # run the k-means algo 
     npx ts-node --esm src/k-means-scores.ts $i
-    # plot the scores
-    python3 src/plotting/plot_scores.py $i
+    # queue the scores plot
+    echo "{\"script\": \"src/plotting/plot_scores.py\", \"args\": [$i]}" >> "$manifest"
 
-done 
\ No newline at end of file
+done 
+
+# render every plot in a single python process
+python3 src/plotting/batch_render.py "$manifest" --workers 4
+rm "$manifest"
+
+# fold the new score files into the running per-k summary and plot it
+python3 src/plotting/aggregate_scores.py ./tests/data/output/scores ./tests/plots/scores/summary_plot.png
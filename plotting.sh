@@ -48,9 +48,16 @@
 #     done 
 # done 
 
-for full_filename in "./tests/data/gitcoin/output"/*output*; do
-    # Strip the directory path 
-    filename=$(basename -- "$full_filename")
+# consolidate the per-run output files into a single results store, which
+# the plot scripts read from
+python3 src/plotting/results_store.py ingest ./tests/data/gitcoin/output --delete
+
+manifest=$(mktemp)
+for filename in $(python3 src/plotting/results_store.py list ./tests/data/gitcoin/output); do
     echo "$filename"
-    python3 src/plotting/plot_gitcoin_traditional_qf.py $filename 
+    echo "{\"script\": \"src/plotting/plot_gitcoin_traditional_qf.py\", \"args\": [\"$filename\"]}" >> "$manifest"
 done
+
+# render every plot in a single python process
+python3 src/plotting/batch_render.py "$manifest" --workers 4
+rm "$manifest"
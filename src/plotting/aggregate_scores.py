@@ -0,0 +1,165 @@
+import glob
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+import render
+
+# the score arrays written by the TS scorers
+METRICS = ['silhoutteScores', 'dbIndexes', 'elbows', 'dunnScores']
+# the quantiles tracked per k (the outer two give the plotted band)
+QUANTILES = [0.1, 0.5, 0.9]
+
+# P-square streaming quantile estimate (Jain & Chlamtac, 1985)
+# keeps five markers per quantile, so memory does not grow with the
+# number of iterations; the state is a plain dict so it can be saved as JSON
+def p2_new(p):
+    return {'p': p, 'heights': [], 'positions': [0, 1, 2, 3, 4],
+            'desired': [0, 2*p, 4*p, 2+2*p, 4], 'increments': [0, p/2, p, (1+p)/2, 1]}
+
+def p2_add(state, x):
+    q = state['heights']
+    # the first five observations are the initial markers
+    if len(q) < 5:
+        q.append(x)
+        q.sort()
+        return
+
+    n = state['positions']
+    if x < q[0]:
+        q[0] = x
+        cell = 0
+    elif x >= q[4]:
+        q[4] = x
+        cell = 3
+    else:
+        cell = next(i for i in range(4) if q[i] <= x < q[i+1])
+
+    for i in range(cell+1, 5):
+        n[i] += 1
+    for i in range(5):
+        state['desired'][i] += state['increments'][i]
+
+    # move the middle markers towards their desired positions
+    for i in range(1, 4):
+        d = state['desired'][i] - n[i]
+        if (d >= 1 and n[i+1] - n[i] > 1) or (d <= -1 and n[i-1] - n[i] < -1):
+            d = 1 if d > 0 else -1
+            parabolic = q[i] + d / (n[i+1] - n[i-1]) * (
+                (n[i] - n[i-1] + d) * (q[i+1] - q[i]) / (n[i+1] - n[i]) +
+                (n[i+1] - n[i] - d) * (q[i] - q[i-1]) / (n[i] - n[i-1])
+            )
+            if q[i-1] < parabolic < q[i+1]:
+                q[i] = parabolic
+            else:
+                q[i] = q[i] + d * (q[i+d] - q[i]) / (n[i+d] - n[i])
+            n[i] += d
+
+def p2_value(state):
+    q = state['heights']
+    if len(q) < 5:
+        return float(np.quantile(q, state['p']))
+    return q[2]
+
+# running count, mean and variance (Welford) plus quantiles of one (metric, k)
+def stats_new():
+    return {'count': 0, 'mean': 0.0, 'm2': 0.0, 'quantiles': [p2_new(p) for p in QUANTILES]}
+
+def stats_add(stats, x):
+    stats['count'] += 1
+    delta = x - stats['mean']
+    stats['mean'] += delta / stats['count']
+    stats['m2'] += delta * (x - stats['mean'])
+    for quantile in stats['quantiles']:
+        p2_add(quantile, x)
+
+def stats_summary(stats):
+    variance = stats['m2'] / (stats['count'] - 1) if stats['count'] > 1 else 0.0
+    summary = {'count': stats['count'], 'mean': stats['mean'], 'variance': variance, 'std': variance ** 0.5}
+    for quantile in stats['quantiles']:
+        summary[f"q{round(quantile['p']*100)}"] = p2_value(quantile)
+    return summary
+
+# the iteration number of a scores_<i>.json file, for a stable reading order
+def iteration_of(path):
+    match = re.search(r'_(\d+)\.json$', path)
+    return int(match.group(1)) if match else -1
+
+# fold every score file that has not been seen yet into the saved state
+# @note raises a ValueError for a file scoring other ks than the summary
+def aggregate(pattern, summary_path):
+    if os.path.exists(summary_path):
+        with open(summary_path) as infile:
+            state = json.load(infile)['state']
+    else:
+        state = {'files': [], 'ks': None, 'metrics': {}}
+
+    seen = set(state['files'])
+    new_files = sorted((f for f in glob.glob(pattern) if os.path.basename(f) not in seen), key=iteration_of)
+    for path in new_files:
+        # one file at a time, nothing is kept once it has been folded in
+        with open(path) as infile:
+            scores = json.load(infile)
+        ks = scores.get('ks', list(range(3, 3 + len(scores[METRICS[0]]))))
+        if state['ks'] is None:
+            state['ks'] = ks
+        # the running stats are per k, so they only fold runs over the same ks
+        if ks != state['ks'] or any(len(scores[metric]) != len(ks) for metric in METRICS):
+            raise ValueError(
+                f"{path} scores k={ks} but {summary_path} aggregates k={state['ks']}, "
+                'delete the summary to start a new one'
+            )
+
+        for metric in METRICS:
+            per_k = state['metrics'].setdefault(metric, [stats_new() for _ in state['ks']])
+            for stats, value in zip(per_k, scores[metric]):
+                stats_add(stats, value)
+        state['files'].append(os.path.basename(path))
+
+    summary = {
+        'ks': state['ks'],
+        'iterations': len(state['files']),
+        'metrics': {metric: [stats_summary(x) for x in per_k] for metric, per_k in state['metrics'].items()},
+        'state': state
+    }
+    with open(summary_path + '.tmp', 'w') as outfile:
+        json.dump(summary, outfile, indent=4)
+    os.replace(summary_path + '.tmp', summary_path)
+
+    print(f"{len(new_files)} new score files, {summary['iterations']} aggregated")
+    return summary
+
+# one panel per metric: the mean, a +-1 std band and the 10-90% quantile band
+def plot_summary(summary, path):
+    fig, grid = render.axes('scores_summary', figsize=(12, 8), nrows=2, ncols=2)
+    ks = summary['ks']
+    for ax, metric in zip(grid.flat, METRICS):
+        rows = summary['metrics'].get(metric, [])
+        if not rows:
+            continue
+        mean = np.array([x['mean'] for x in rows])
+        std = np.array([x['std'] for x in rows])
+        ax.fill_between(ks, [x['q10'] for x in rows], [x['q90'] for x in rows], color='g', alpha=0.15, label='10-90%')
+        ax.fill_between(ks, mean - std, mean + std, color='g', alpha=0.3, label='mean +- std')
+        ax.plot(ks, mean, color='g', label='mean')
+        ax.plot(ks, [x['q50'] for x in rows], color='k', linestyle='--', label='median')
+
+        ax.set_title(f"{metric} over {summary['iterations']} iterations")
+        ax.set_xlabel('k')
+        ax.set_xticks(ks)
+        ax.tick_params(axis='x', labelsize=6)
+        ax.legend(fontsize=6)
+
+    fig.tight_layout()
+    render.save(fig, path)
+
+if __name__ == "__main__":
+    # python3 src/plotting/aggregate_scores.py [scores dir] [plot path]
+    scores_dir = sys.argv[1] if len(sys.argv) > 1 else './tests/data/output/scores'
+    plot_path = sys.argv[2] if len(sys.argv) > 2 else './tests/plots/scores/summary_plot.png'
+
+    summary = aggregate(os.path.join(scores_dir, 'scores_*.json'), os.path.join(scores_dir, 'summary.json'))
+    plot_summary(summary, plot_path)
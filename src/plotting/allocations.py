@@ -0,0 +1,99 @@
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
+# the four allocation variants of the TS KMeans, named like its output files
+# one_minus: coefficient = 1 - clusterSize/voters, otherwise clusterSize/voters
+# square_before: coefficient applied after sqrt(weight)
+# square_after: coefficient applied before sqrt(weight)
+VARIANTS = [
+    'one_minus_square_before',
+    'one_minus_square_after',
+    'square_before',
+    'square_after'
+]
+
+# the size of each cluster for every run of assignments (runs x k)
+# @param counts the number of voters behind each row (all 1 by default)
+def cluster_sizes(assignments, k, counts=None):
+    runs = assignments.shape[0]
+    # shift each run into its own block of k bins so one bincount does all runs
+    offsets = assignments + k * np.arange(runs)[:, None]
+    weights = None if counts is None else np.tile(counts, runs)
+    sizes = np.bincount(offsets.ravel(), weights=weights, minlength=runs*k).reshape(runs, k)
+    return sizes if counts is None else sizes.astype(np.int64)
+
+# the coefficient of each cluster (runs x k)
+def cluster_coefficients(sizes, voters, one_minus):
+    coefficients = sizes / voters
+    if one_minus:
+        coefficients = 1 - coefficients
+    # no voter has the coefficient of an empty cluster, the TS code uses 1;
+    # its voters also get 1 for a coefficient of 0 (`coefficient || 1`), i.e.
+    # for one cluster holding every voter when one_minus
+    coefficients[(sizes == 0) | (coefficients == 0)] = 1
+    return coefficients
+
+# the sum of sqrt(weight) per cluster and project for every run (runs x k x projects)
+# @note a single sparse one-hot product, so memory is runs*k*projects
+# instead of runs*voters*projects
+def cluster_root_sums(roots, assignments, k, counts=None):
+    runs, voters = assignments.shape
+    rows = (assignments + k * np.arange(runs)[:, None]).ravel()
+    cols = np.tile(np.arange(voters), runs)
+    values = np.ones(rows.size) if counts is None else np.tile(counts, runs).astype(np.float64)
+    onehot = csr_matrix((values, (rows, cols)), shape=(runs*k, voters))
+    sums = onehot @ roots
+    if issparse(sums):
+        sums = sums.toarray()
+
+    return np.asarray(sums).reshape(runs, k, -1)
+
+# compute traditional QF plus the qfs, penalties and coefficients of all four
+# variants, for one assignment vector (voters) or many (runs x voters)
+# @param weights the voters x projects vote weights (dense or sparse)
+# @param assignments the cluster index of each voter
+# @param k the number of clusters (defaults to the largest index + 1)
+# @param counts when the rows are unique ballots (see dedupe.py), the number
+# of voters who cast each one
+def allocate(weights, assignments, k=None, counts=None):
+    assignments = np.asarray(assignments)
+    single = assignments.ndim == 1
+    assignments = np.atleast_2d(assignments)
+    voters = assignments.shape[1] if counts is None else int(np.sum(counts))
+    if k is None:
+        k = int(assignments.max()) + 1
+
+    roots = weights.sqrt() if issparse(weights) else np.sqrt(np.asarray(weights, dtype=np.float64))
+    # =SUM([vote1User1,vote1User2,vote1User3]**0.5)**2
+    column_sums = roots.sum(axis=0) if counts is None else roots.T @ np.asarray(counts, dtype=np.float64)
+    trad_qfs = np.square(np.asarray(column_sums).ravel())
+
+    sizes = cluster_sizes(assignments, k, counts)
+    sums = cluster_root_sums(roots, assignments, k, counts)
+
+    output = {'tradQFs': trad_qfs, 'clustersSizes': sizes[0] if single else sizes}
+    for one_minus in (True, False):
+        coefficients = cluster_coefficients(sizes, voters, one_minus)
+        prefix = 'one_minus_' if one_minus else ''
+        variants = {
+            # =SUM([vote1User1**0.5*s, vote1User2**0.5*r])**2
+            'square_before': np.square(np.einsum('rk,rkp->rp', coefficients, sums)),
+            # =SUM([(vote1User1*s)**0.5, (vote1User2*r)**0.5])**2
+            'square_after': np.square(np.einsum('rk,rkp->rp', np.sqrt(coefficients), sums))
+        }
+        for name, qfs in variants.items():
+            output[prefix + name] = {
+                'coefficients': coefficients[0] if single else coefficients,
+                'qfs': qfs[0] if single else qfs,
+                'penalties': trad_qfs - qfs[0] if single else trad_qfs - qfs
+            }
+
+    return output
+
+# the coefficient of every voter, given the coefficients of its cluster
+def voters_coefficients(assignments, coefficients):
+    assignments = np.asarray(assignments)
+    if assignments.ndim == 1:
+        return np.asarray(coefficients)[assignments]
+
+    return np.take_along_axis(np.asarray(coefficients), assignments, axis=1)
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+from sklearn.preprocessing import MaxAbsScaler, StandardScaler
+
+from tracing import traced
+
+# the version written in the metadata header of a round store
+# (version 2: the weights are float64 when float32 would round them)
+STORE_VERSION = 2
+
+# convert a list of parsed ballots ({projectId: {voteOption, voteWeight}})
+# into a voters x projects CSR matrix, so memory scales with the votes
+def ballots_to_csr(ballots, projects=None):
+    indptr = np.zeros(len(ballots)+1, dtype=np.int64)
+    indices = []
+    weights = []
+    for i, ballot in enumerate(ballots):
+        for vote in ballot.values():
+            # vote options start counting from 1
+            indices.append(int(vote['voteOption']) - 1)
+            weights.append(float(vote['voteWeight']))
+        indptr[i+1] = len(indices)
+
+    indices = np.asarray(indices, dtype=np.int32)
+    weights = np.asarray(weights, dtype=np.float64)
+
+    # if no projects are passed in, the largest vote option is the number of projects
+    if projects is None:
+        projects = int(indices.max()) + 1 if indices.size else 0
+
+    matrix = csr_matrix((weights, indices, indptr), shape=(len(ballots), projects))
+    # a project voted twice in the same ballot is a single (summed) entry
+    matrix.sum_duplicates()
+
+    return matrix
+
+# read a mainnet_votes_parsed_*.json file straight into a CSR matrix
+@traced
+def load_ballots(path, projects=None):
+    with open(path) as infile:
+        ballots = json.load(infile)
+
+    return ballots_to_csr(ballots, projects)
+
+# read either a mainnet_votes_parsed_*.json file or a converted round store
+# @param dtype the weights of a store (often float32) are cast to this,
+# like the weights parsed from JSON (some estimators, e.g. GaussianMixture,
+# fail on float32); None keeps the zero-copy weights for the consumers
+# which accept them
+def load_round_matrix(path, dtype=np.float64):
+    if os.path.isdir(path):
+        matrix = store_to_csr(path)
+        if dtype is not None and matrix.dtype != dtype:
+            matrix = matrix.astype(dtype)
+        return matrix
+
+    return load_ballots(path)
+
+# the default location of a round store, next to the parsed JSON files
+def store_path(json_path):
+    name = os.path.splitext(os.path.basename(json_path))[0]
+    return os.path.join(os.path.dirname(json_path), 'store', name)
+
+# one-time conversion of a parsed round into three columnar arrays
+# (voter index, project index, float32 or float64 weight) plus a metadata header
+def convert_round(json_path, out_dir=None):
+    if out_dir is None:
+        out_dir = store_path(json_path)
+
+    return save_round(load_ballots(json_path), out_dir, os.path.basename(json_path))
+
+# write a voters x projects matrix as a round store
+# @param source recorded in the metadata header, e.g. the parsed JSON file
+def save_round(matrix, out_dir, source):
+    coo = matrix.tocsr().tocoo()
+    os.makedirs(out_dir, exist_ok=True)
+
+    # CSR order: sorted by voter, then by project
+    np.save(os.path.join(out_dir, 'voters.npy'), coo.row.astype(np.int32))
+    np.save(os.path.join(out_dir, 'projects.npy'), coo.col.astype(np.int32))
+    # float32 only when it holds every weight exactly: rounded weights move
+    # the points on the eps and core distance boundaries of DBSCAN/HDBSCAN
+    weights = coo.data.astype(np.float32)
+    if not np.array_equal(weights, coo.data):
+        weights = coo.data.astype(np.float64)
+    np.save(os.path.join(out_dir, 'weights.npy'), weights)
+
+    meta = {
+        'version': STORE_VERSION,
+        'source': source,
+        'voters': int(matrix.shape[0]),
+        'projects': int(matrix.shape[1]),
+        'votes': int(matrix.nnz)
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as outfile:
+        json.dump(meta, outfile, indent=4)
+
+    return out_dir
+
+# memory-map the arrays of a round store, nothing is read until it is used
+def load_round(path):
+    with open(os.path.join(path, 'meta.json')) as infile:
+        meta = json.load(infile)
+
+    if meta['version'] != STORE_VERSION:
+        raise ValueError(f"Unsupported round store version {meta['version']} in {path}")
+
+    voters = np.load(os.path.join(path, 'voters.npy'), mmap_mode='r')
+    projects = np.load(os.path.join(path, 'projects.npy'), mmap_mode='r')
+    weights = np.load(os.path.join(path, 'weights.npy'), mmap_mode='r')
+
+    return meta, voters, projects, weights
+
+# wrap a round store in a CSR matrix which shares the memory-mapped
+# project and weight arrays (only the row pointers are allocated)
+@traced
+def store_to_csr(path):
+    meta, voters, projects, weights = load_round(path)
+    indptr = np.searchsorted(voters, np.arange(meta['voters']+1)).astype(np.int32)
+
+    return csr_matrix((weights, projects, indptr), shape=(meta['voters'], meta['projects']))
+
+# scale the weights without densifying sparse input
+# maxabs: divide each project by its largest weight
+# standard: unit variance per project (mean-free when the input is sparse)
+@traced
+def scale(data, method='standard'):
+    if method == 'maxabs':
+        scaler = MaxAbsScaler()
+    elif method == 'standard':
+        # centering would turn every zero into a non-zero
+        scaler = StandardScaler(with_mean=not issparse(data))
+    else:
+        raise ValueError(f'Unknown scaling method {method}')
+
+    return scaler.fit_transform(data)
+
+# the number of projects each voter backed
+def votes_per_ballot(data):
+    if issparse(data):
+        return np.diff(data.tocsr().indptr)
+
+    return np.count_nonzero(np.asarray(data), axis=1)
+
+# fit the sweep tasks on the JSON round and on its store, in this process
+# and with the same seed, and compare the labels
+# @return the tasks whose labels differ, {task: adjusted rand index}
+def check_store(json_path, out_dir, max_clusters=6):
+    # the sweep imports this module (through density.py)
+    from sklearn.metrics import adjusted_rand_score
+    from sweep import GROUPED_ALGORITHMS, build_tasks, fit_job, init_worker
+
+    tasks = build_tasks(max_clusters)
+    jobs = [[task for task in tasks if task[0] == algorithm] for algorithm in GROUPED_ALGORITHMS]
+    jobs += [[task] for task in tasks if task[0] not in GROUPED_ALGORITHMS]
+    labels = []
+    for data in (load_round_matrix(json_path), load_round_matrix(out_dir)):
+        init_worker({'raw': data, 'standardized': scale(data)})
+        results = {}
+        for job in jobs:
+            # the estimators without a random_state draw from numpy's
+            np.random.seed(0)
+            for task, result in zip(job, fit_job(job)):
+                results[task] = result['labels']
+        labels.append(results)
+
+    differences = {}
+    for task in tasks:
+        score = adjusted_rand_score(labels[0][task], labels[1][task])
+        if score < 1:
+            differences[task] = score
+
+    return differences
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert parsed rounds into round stores')
+    parser.add_argument('rounds', nargs='+', help='mainnet_votes_parsed_*.json files')
+    parser.add_argument('--check', action='store_true', help='check that the sweep gives the same clusters on the store as on the JSON round')
+    args = parser.parse_args()
+
+    failed = False
+    for json_path in args.rounds:
+        out_dir = convert_round(json_path)
+        print(f'{json_path} -> {out_dir}')
+        if args.check:
+            differences = check_store(json_path, out_dir)
+            for (algorithm, param), score in differences.items():
+                print(f'  {algorithm} ({param}): adjusted rand index {score:.4f} between the JSON round and the store')
+            print(f"  {'different' if differences else 'same'} sweep results on the store")
+            failed = failed or bool(differences)
+
+    sys.exit(1 if failed else 0)
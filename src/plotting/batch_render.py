@@ -0,0 +1,90 @@
+import argparse
+import functools
+import json
+import os
+import runpy
+import sys
+import traceback
+from multiprocessing import Pool
+
+# import the heavy libraries once, every job then reuses them
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+import fingerprint
+from tracing import span
+
+# read a JSON lines manifest, one job per line:
+# {"script": "src/plotting/plot_k_means.py", "args": [3, 1]}
+def read_manifest(path):
+    jobs = []
+    with open(path) as infile:
+        for line in infile:
+            line = line.strip()
+            if line:
+                jobs.append(json.loads(line))
+
+    return jobs
+
+# run a single plot script in this process as if it was started with
+# `python3 script args...`, unless the figures of its last run are up to
+# date (see fingerprint.py)
+# @return (status, error): 'skipped', 'rebuilt' or 'failed', with the error
+def run_job(job, force=False, jobs_dir=fingerprint.JOBS_DIR):
+    if not force and fingerprint.up_to_date(job, jobs_dir):
+        return 'skipped', None
+
+    script = job['script']
+    saved_argv = sys.argv
+    saved_path = list(sys.path)
+    sys.argv = [script] + [str(x) for x in job.get('args', [])]
+    # the scripts import their siblings, like `python3 script` would allow
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    fingerprint.start_tracking()
+    try:
+        with span(os.path.basename(script), args=sys.argv[1:]):
+            runpy.run_path(script, run_name='__main__')
+    except BaseException:
+        fingerprint.stop_tracking()
+        return 'failed', traceback.format_exc()
+    else:
+        inputs, outputs, runs = fingerprint.stop_tracking()
+        fingerprint.record_job(job, inputs, outputs, runs, jobs_dir)
+        return 'rebuilt', None
+    finally:
+        sys.argv = saved_argv
+        sys.path[:] = saved_path
+        # never carry the figures of a job over to the next one
+        plt.close('all')
+
+# run every job, either here or spread over a pool of long-lived workers
+# @param force run every job, even when its figures are up to date
+def render(jobs, workers=1, force=False, jobs_dir=fingerprint.JOBS_DIR):
+    run = functools.partial(run_job, force=force, jobs_dir=jobs_dir)
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.map(run, jobs, chunksize=1)
+    else:
+        results = [run(job) for job in jobs]
+
+    counts = {'rebuilt': 0, 'skipped': 0, 'failed': 0}
+    for job, (status, error) in zip(jobs, results):
+        counts[status] += 1
+        if error is not None:
+            print(f"{job['script']} {' '.join(str(x) for x in job.get('args', []))} failed:\n{error}", file=sys.stderr)
+
+    print(f"{len(jobs)} jobs: {counts['rebuilt']} rebuilt, {counts['skipped']} skipped (up to date), {counts['failed']} failed")
+    return counts['failed']
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run many plot scripts in a single long-lived process')
+    parser.add_argument('manifest', help='JSON lines file with one {"script", "args"} job per line')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--force', action='store_true', help='rebuild every figure, even the ones whose inputs did not change')
+    parser.add_argument('--jobs-dir', default=fingerprint.JOBS_DIR, help='where the outputs of every job are recorded')
+    args = parser.parse_args()
+
+    failed = render(read_manifest(args.manifest), args.workers, args.force, args.jobs_dir)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+import sklearn
+
+import render
+import sweep
+from ballots import load_round_matrix, save_round, scale
+from clustering import plot_cluster_sizes
+from projection import project, plot_projection
+from scoring import score_round
+from synthetic import WEIGHT_DISTRIBUTIONS, generate_round
+
+VOTERS = [10**3, 10**4, 10**5, 10**6]
+KS = [3, 5, 10]
+
+# above these many voters a stage is skipped: the ward linkage and the
+# scores need voters^2 time (and the linkage voters^2 memory), GMM fits a
+# dense copy of the matrix, the spectral embedding solves an eigenproblem
+# over the k-NN graph and DBSCAN builds a neighbor graph; HDBSCAN needs
+# voters * projects memory (dense rows) but its Boruvka tree over 100
+# projects takes close to voters^2 time (12s at 10k voters, 117s at 30k)
+MAX_VOTERS = {
+    'agglomerative': 10000,
+    'scoring': 20000,
+    'gmm': 100000,
+    'spectral': 20000,
+    'dbscan': 100000,
+    'hdbscan': 30000
+}
+
+# a stage slower than the baseline by more than this ratio is a regression
+REGRESSION = 1.2
+
+# the commit the benchmark runs on, None outside of a git checkout
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# run fn(), recording its wall time and, with memory, the peak of the memory
+# allocated while it ran (numpy buffers included)
+# @return (result, {'stage', 'seconds', 'peak_mb'})
+def measure(stage, fn, memory=True):
+    if memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = fn()
+        record = {'stage': stage, 'seconds': time.perf_counter() - start}
+        if memory:
+            record['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        # a failed stage does not leave the next ones traced
+        if memory:
+            tracemalloc.stop()
+
+    print(f"  {stage}: {record['seconds']:.3f}s" + (f", peak {record['peak_mb']:.1f}MB" if memory else ''))
+    return result, record
+
+# time every stage of the pipeline on one synthetic round: loading its
+# store, scaling, every algorithm of the sweep, scoring and rendering
+def benchmark_round(voters, args, workdir):
+    matrix, _ = generate_round(
+        voters, args.projects, args.density, args.weights, args.popularity,
+        args.blocks, args.block_size, random_state=args.seed
+    )
+    store = save_round(matrix, os.path.join(workdir, f'round_{voters}'), f'synthetic seed {args.seed}')
+    print(f'{voters} voters x {args.projects} projects, {matrix.nnz} votes')
+    limits = {} if args.full else MAX_VOTERS
+    stages = []
+
+    def skip(stage):
+        if voters <= limits.get(stage, voters):
+            return False
+        stages.append({'stage': stage, 'skipped': f'more than {limits[stage]} voters'})
+        print(f'  {stage}: skipped')
+        return True
+
+    # read every array, the store is only memory-mapped until then
+    data, record = measure('load', lambda: load_round_matrix(store).copy(), args.memory)
+    stages.append(record)
+    standardized, record = measure('scale', lambda: scale(data, 'standard'), args.memory)
+    stages.append(record)
+
+    # the sweep runs in this process, on the datasets its workers would get
+    sweep.init_worker({'raw': data, 'standardized': standardized})
+    results = {}
+    for algorithm in sweep.ELBOW_ALGORITHMS + ['dbscan', 'hdbscan']:
+        if skip(algorithm):
+            continue
+        tasks = [task for task in sweep.build_tasks(max(args.ks)) if task[0] == algorithm]
+        if algorithm in sweep.ELBOW_ALGORITHMS:
+            tasks = [task for task in tasks if task[1] in args.ks]
+        if algorithm in sweep.GROUPED_ALGORITHMS:
+            jobs = [tasks]
+        else:
+            jobs = [[task] for task in tasks]
+        try:
+            fitted, record = measure(algorithm, lambda: [result for job in jobs for result in sweep.fit_job(job)], args.memory)
+        except Exception as error:
+            # a failed algorithm is recorded, the other stages still run
+            stages.append({'stage': algorithm, 'error': f'{type(error).__name__}: {error}'})
+            print(f'  {algorithm}: failed, {error}')
+            continue
+        record['fits'] = len(tasks)
+        stages.append(record)
+        results[algorithm] = fitted
+
+    # the scores and the plots are of the KMeans labellings, if it ran
+    labellings = {result['param']: np.asarray(result['labels']) for result in results.get('kmeans', [])}
+    if not labellings:
+        for stage in ('scoring', 'render'):
+            stages.append({'stage': stage, 'skipped': 'no KMeans labellings'})
+            print(f'  {stage}: skipped')
+        return {'voters': voters, 'projects': args.projects, 'votes': int(matrix.nnz), 'stages': stages}
+
+    if not skip('scoring'):
+        # like scoring.py, on sqrt(weight)
+        _, record = measure('scoring', lambda: score_round(data.sqrt(), labellings), args.memory)
+        stages.append(record)
+
+    def render_round():
+        coordinates = project(standardized)
+        for k, labels in labellings.items():
+            plot_projection(coordinates, labels, f'KMeans k={k}', os.path.join(workdir, f'clusters_{k}.png'))
+            plot_cluster_sizes(np.bincount(labels), f'KMeans k={k}', os.path.join(workdir, f'sizes_{k}.png'))
+        render.release()
+    _, record = measure('render', render_round, args.memory)
+    stages.append(record)
+
+    return {'voters': voters, 'projects': args.projects, 'votes': int(matrix.nnz), 'stages': stages}
+
+# print every stage slower than in the baseline by more than the threshold
+# @return the number of regressions
+def compare(baseline, report, threshold=REGRESSION):
+    before = {
+        (run['voters'], stage['stage']): stage['seconds']
+        for run in baseline['runs'] for stage in run['stages'] if 'seconds' in stage
+    }
+    regressions = 0
+    print(f"compared to {baseline.get('commit')}:")
+    if baseline['settings'].get('memory') != report['settings'].get('memory'):
+        print('  only one of the runs traced the memory, which slows the stages down')
+    for run in report['runs']:
+        for stage in run['stages']:
+            key = (run['voters'], stage['stage'])
+            if 'seconds' not in stage or key not in before or before[key] == 0:
+                continue
+            ratio = stage['seconds'] / before[key]
+            flag = ' REGRESSION' if ratio > threshold else ''
+            regressions += ratio > threshold
+            print(f"  {run['voters']} voters {stage['stage']}: {before[key]:.3f}s -> {stage['seconds']:.3f}s ({ratio:.2f}x){flag}")
+
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Time and memory-profile every stage of the pipeline on synthetic rounds')
+    parser.add_argument('--voters', type=int, nargs='+', default=VOTERS)
+    parser.add_argument('--projects', type=int, default=100)
+    parser.add_argument('--density', type=float, default=0.05, help='mean fraction of the projects a ballot votes for')
+    parser.add_argument('--weights', choices=WEIGHT_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--popularity', type=float, default=1.0, help='Zipf exponent of the project popularity')
+    parser.add_argument('--blocks', type=int, default=5, help='collusion blocks injected in every round')
+    parser.add_argument('--block-size', type=int, default=50)
+    parser.add_argument('--ks', type=int, nargs='+', default=KS, help='the numbers of clusters fitted by the elbow algorithms')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--full', action='store_true', help='run every stage at every size, ignoring MAX_VOTERS')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='only time the stages (tracing the allocations slows them down)')
+    parser.add_argument('--output', help='defaults to ./tests/data/benchmarks/<commit>.json')
+    parser.add_argument('--compare', help='a previous benchmark JSON, every stage slower by more than 20%% is reported')
+    args = parser.parse_args()
+
+    commit = current_commit()
+    report = {
+        'commit': commit,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'sklearn': sklearn.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count()
+        },
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'runs': []
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for voters in args.voters:
+            report['runs'].append(benchmark_round(voters, args, workdir))
+
+    output = args.output or f"./tests/data/benchmarks/{commit or 'benchmark'}.json"
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as outfile:
+        json.dump(report, outfile, indent=4)
+    print(f'-> {output}')
+
+    if args.compare:
+        with open(args.compare) as infile:
+            regressions = compare(json.load(infile), report)
+        sys.exit(1 if regressions else 0)
@@ -1,11 +1,16 @@
+import argparse
 import json
-import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans, AgglomerativeClustering, SpectralClustering, DBSCAN
-from sklearn.mixture import GaussianMixture
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-from hdbscan import HDBSCAN
+import os
 import numpy as np
+import render
+from ballots import load_round_matrix, scale, votes_per_ballot
+from sweep import build_tasks, run_sweep, cluster_sizes, succeeded
+from dedupe import unique_ballots, expand_labels
+from density import density_table, print_table
+from kmeans_sweep import warm_fits, full_fits
+from knee import adaptive_sweep
+from projection import MAX_POINTS, project, plot_projection
+from tracing import span, traced
 
 def find_elbow(wcss):
     # Calculate the differences between consecutive WCSS values
@@ -17,110 +22,190 @@ def find_elbow(wcss):
 
     return elbow
 
-def plot_clusters(data, labels, title, filename):
-    # Use PCA to reduce the data to 2D for visualization
-    pca = PCA(n_components=2)
-    reduced_data = pca.fit_transform(data)
-    x_coords, y_coords = zip(*reduced_data)  # unpack x and y coordinates after reduction
-    plt.scatter(x_coords, y_coords, c=labels, cmap='rainbow')
-    plt.title(title)
-    plt.savefig(filename)
-    plt.clf()  # Clear the current figure for the next plot
+# @param coordinates the 2-D projection of the data (projection.project),
+# computed once and shared by every labelling
+@traced
+def plot_clusters(coordinates, labels, title, filename, max_points=MAX_POINTS):
+    plot_projection(coordinates, labels, title, filename, max_points)
 
+@traced
 def plot_cluster_sizes(cluster_sizes, title, filename):
     n_clusters = len(cluster_sizes)
-    plt.bar(range(n_clusters), cluster_sizes, color='skyblue')
-    plt.title(title)
-    plt.xlabel('Cluster ID')
-    plt.xticks(list(range(n_clusters)))
-    plt.ylabel('Number of Points')
-    plt.savefig(filename)
-    plt.clf()
+    fig, ax = render.axes('cluster_sizes')
+    ax.bar(range(n_clusters), cluster_sizes, color='skyblue')
+    ax.set_title(title)
+    ax.set_xlabel('Cluster ID')
+    ax.set_xticks(list(range(n_clusters)))
+    ax.set_ylabel('Number of Points')
+    render.save(fig, filename, dpi=100)
 
 
 if __name__ == "__main__":
-    with open("./tests/data/gitcoin/weights.json") as infile:
-        data = json.load(infile)
+    parser = argparse.ArgumentParser(description='Sweep the clustering algorithms over a weights matrix')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (defaults to the number of cores)')
+    parser.add_argument('--cache', default='./tests/data/gitcoin/sweep_cache', help='directory of the fitted models, keyed by the input matrix, scaler and hyperparameters')
+    parser.add_argument('--cache-size', type=int, default=512, help='size limit of the cache in MB, the least recently used fits are evicted past it')
+    parser.add_argument('--round', help='a mainnet_votes_parsed_*.json file or its converted round store, clustered as a sparse matrix (defaults to the dense weights.json)')
+    parser.add_argument('--kmeans', choices=['full', 'warm'], default='full', help='fit KMeans per k from a fresh k-means++ seeding (full), or warm-start every k from the previous one (mini-batch on large rounds)')
+    parser.add_argument('--adaptive', action='store_true', help='fit k in increasing order and stop once the knee of the WCSS curve is confirmed')
+    parser.add_argument('--margin', type=int, default=2, help='how many ks past the knee the adaptive sweep fits before stopping')
+    parser.add_argument('--dedupe', action='store_true', help='fit KMeans and DBSCAN on the unique ballots only, weighted by how many voters cast each one')
+    parser.add_argument('--max-points', type=int, default=MAX_POINTS, help='above this many voters the cluster scatters are drawn as binned density images')
+    parser.add_argument('--scaler', choices=['standard', 'maxabs'], default='standard', help='how to scale the weights (standard is mean-free on sparse input)')
+    args = parser.parse_args()
+
+    if args.round:
+        # build the matrix straight from the ballots, keeping it sparse
+        data = load_round_matrix(args.round)
+    else:
+        with span('load weights.json'), open("./tests/data/gitcoin/weights.json") as infile:
+            data = np.asarray(json.load(infile))
+
+    print(f"{np.sum(votes_per_ballot(data) == 1)} of {data.shape[0]} ballots vote for a single project")
 
-    counter = 0
-    for x in data:
-        for y in x:
-            if y > 0:
-                counter += 1
-        if counter == 1:
-            print(x)
-
-    
-        
     # Standardize the data
-    scaler = StandardScaler()
-    standardized_data = scaler.fit_transform(data)
+    standardized_data = scale(data, args.scaler)
 
-    # KMeans clustering
-    wcss = []
     max_clusters = 20
+    ks = list(range(3, max_clusters+1))
+
+    # warm-started KMeans fits depend on each other and the adaptive sweep
+    # decides after every k whether to go on, so these run here in sequence
+    kmeans_results = None
+    adaptive = None
+    if args.kmeans == 'warm' or args.adaptive:
+        if args.dedupe:
+            index, counts, inverse = unique_ballots(data)
+            kmeans_data = standardized_data[index]
+        else:
+            counts, inverse = None, None
+            kmeans_data = standardized_data
+        if args.kmeans == 'warm':
+            fits = warm_fits(kmeans_data, ks, sample_weight=counts)
+        else:
+            fits = full_fits(kmeans_data, ks, sample_weight=counts)
+
+        with span('kmeans curve', method=args.kmeans, adaptive=args.adaptive):
+            if args.adaptive:
+                adaptive = adaptive_sweep(fits, ks, args.margin)
+                kmeans_results = adaptive['results']
+                print(f"knee at k={adaptive['knee']}, skipped k={adaptive['skipped']}")
+            else:
+                kmeans_results = dict(fits)
+
+        for n, result in kmeans_results.items():
+            if inverse is not None:
+                labels = expand_labels(result['labels'], inverse)
+                result['labels'] = [int(x) for x in labels]
+                result['sizes'], result['noise'] = cluster_sizes(labels)
+            print(f"KMeans k={n}: WCSS {result['inertia']:.2f} after {result['passes']:.1f} passes")
+        # the other algorithms only run for the ks the KMeans curve reached
+        ks = sorted(kmeans_results)
+
+    # every (algorithm, hyperparameter) fit is independent, so run them all
+    # on a process pool and cache each one as it finishes, so only the
+    # configurations never fitted on this exact input are run
+    tasks = build_tasks(max(ks))
+    if kmeans_results is not None:
+        tasks = [task for task in tasks if task[0] != 'kmeans']
+    results = run_sweep(
+        {'raw': data, 'standardized': standardized_data},
+        tasks,
+        args.cache,
+        args.workers,
+        args.scaler,
+        args.cache_size * 2**20,
+        args.dedupe
+    )
+    if kmeans_results is not None:
+        for n, result in kmeans_results.items():
+            results[('kmeans', n)] = result
+
+    # one 2-D projection for every cluster plot, cached next to the fits
+    coordinates = project(standardized_data, args.cache)
+
+    # the plots of a failed fit are skipped, the curves leave its n out
+    def fitted(task):
+        if not succeeded(results.get(task)):
+            print(f"skipping the plots of {task[0]} ({task[1]}): {results.get(task, {}).get('error', 'not fitted')}")
+            return None
+        return results[task]
 
-    bic_scores = []
-    aic_scores = []
-    
-    for n in range(3, max_clusters+1):
-        kmeans = KMeans(n_clusters=n, init='k-means++')
-        kmeans.fit(standardized_data)
-        wcss.append(kmeans.inertia_)
-
-        # Agglomerative Clustering
-        agglomerative = AgglomerativeClustering(n_clusters=n)
-        agglomerative_labels = agglomerative.fit_predict(standardized_data)
-        # plot_clusters(standardized_data, agglomerative_labels, f'Agglomerative Clustering (n_clusters={n})', f'./tests/plots/python/agglomerative_{n}.png')
-        kmeans_cluster_sizes = [np.sum(kmeans.labels_ == i) for i in range(n)]
-        plot_cluster_sizes(kmeans_cluster_sizes, f'KMeans Cluster Sizes (n_clusters={n})', f'./tests/plots/python/kmeans_sizes_{n}.png')
+    # KMeans clustering
+    wcss_ks, wcss = [], []
+    gmm_ks, bic_scores, aic_scores = [], [], []
+
+    for n in ks:
+        result = fitted(('kmeans', n))
+        if result is not None:
+            wcss_ks.append(n)
+            wcss.append(result['inertia'])
+            plot_cluster_sizes(result['sizes'], f'KMeans Cluster Sizes (n_clusters={n})', f'./tests/plots/python/kmeans_sizes_{n}.png')
+            plot_clusters(coordinates, result['labels'], f'KMeans Clusters (n_clusters={n})', f'./tests/plots/python/kmeans_clusters_{n}.png', args.max_points)
+
+        # Agglomerative Clustering (cuts of a single ward tree)
+        result = fitted(('agglomerative', n))
+        if result is not None:
+            plot_cluster_sizes(result['sizes'], f'Agglomerative Clustering Sizes (n_clusters={n})', f'./tests/plots/python/agglomerative_sizes_{n}.png')
+            plot_clusters(coordinates, result['labels'], f'Agglomerative Clusters (n_clusters={n})', f'./tests/plots/python/agglomerative_clusters_{n}.png', args.max_points)
 
         # Spectral Clustering
-        spectral = SpectralClustering(n_clusters=n)
-        spectral_labels = spectral.fit_predict(standardized_data)
-        # plot_clusters(standardized_data, spectral_labels, f'Spectral Clustering (n_clusters={n})', f'./tests/plots/python/spectral_{n}.png')
-        plot_cluster_sizes(spectral_labels, f'Spectral Clustering Sizes (n_clusters={n})', f'./tests/plots/python/spectral_sizes_{n}.png')
+        result = fitted(('spectral', n))
+        if result is not None:
+            plot_cluster_sizes(result['sizes'], f'Spectral Clustering Sizes (n_clusters={n})', f'./tests/plots/python/spectral_sizes_{n}.png')
+            plot_clusters(coordinates, result['labels'], f'Spectral Clusters (n_clusters={n})', f'./tests/plots/python/spectral_clusters_{n}.png', args.max_points)
 
         # Gaussian Mixture Model
-        gmm = GaussianMixture(n_components=n)
-        gmm_labels = gmm.fit_predict(standardized_data)
-        bic_scores.append(gmm.bic(standardized_data))
-        aic_scores.append(gmm.aic(standardized_data))
-        # plot_clusters(standardized_data, gmm_labels, f'GMM (n_components={n})', f'./tests/plots/python/gmm_{n}.png')
-        plot_cluster_sizes(gmm_labels, f'GMM Sizes (n_components={n})', f'./tests/plots/python/gmm_sizes_{n}.png')
-
-    best_k = find_elbow(wcss)
-    print(f"The optimal number of clusters based on the elbow method is: {best_k}")
-
-    # Save the Elbow method graph
-    plt.figure(figsize=(10,5))
-    plt.plot(range(1, max_clusters+1), wcss, marker='o', linestyle='--')
-    plt.title('Elbow Method')
-    plt.xlabel('Number of clusters')
-    plt.ylabel('WCSS')
-    plt.savefig('./tests/plots/python/elbow_method.png')
-    plt.clf()  # Clear the current figure for the next plot
-
-    # DBSCAN clustering with iteration over different eps values
-    for eps_value in np.linspace(0.1, 1.0, 10):
-        dbscan = DBSCAN(eps=eps_value, min_samples=5)
-        dbscan_labels = dbscan.fit_predict(data)
-        # plot_clusters(data, dbscan_labels, f'DBSCAN Clustering (eps={eps_value:.2f})', f'./tests/plots/python/dbscan_eps_{eps_value:.2f}.png')
-
-    # HDBSCAN clustering (Make sure to install hdbscan library)
-    for min_cluster_size in range(2, 12):
-        hdbscan_cluster = HDBSCAN(min_samples=5, min_cluster_size=min_cluster_size)
-        hdbscan_labels = hdbscan_cluster.fit_predict(data)
-        # plot_clusters(data, hdbscan_labels, f'HDBSCAN Clustering (min_cluster_size={min_cluster_size})', f'./tests/plots/python/hdbscan_min_cluster_{min_cluster_size}.png')
-
+        result = fitted(('gmm', n))
+        if result is not None:
+            gmm_ks.append(n)
+            bic_scores.append(result['bic'])
+            aic_scores.append(result['aic'])
+            plot_cluster_sizes(result['sizes'], f'GMM Sizes (n_components={n})', f'./tests/plots/python/gmm_sizes_{n}.png')
+            plot_clusters(coordinates, result['labels'], f'GMM Clusters (n_components={n})', f'./tests/plots/python/gmm_clusters_{n}.png', args.max_points)
+
+    # noise fraction and cluster count of every density based setting
+    for algorithm, name in (('dbscan', 'DBSCAN eps'), ('hdbscan', 'min_cluster_size')):
+        labels = {task[1]: result['labels'] for task, result in results.items() if task[0] == algorithm and succeeded(result)}
+        print_table(name, density_table(labels))
+
+    if adaptive is None and len(wcss) < 2:
+        # every KMeans fit but at most one failed: there is no curve
+        print(f'warning: only {len(wcss)} KMeans fits succeeded, skipping the elbow and the WCSS outputs')
+    else:
+        if adaptive is not None:
+            best_k = adaptive['knee']
+            print(f"The optimal number of clusters based on the knee of the WCSS curve is: {best_k}")
+        else:
+            best_k = wcss_ks[find_elbow(wcss)]
+            print(f"The optimal number of clusters based on the elbow method is: {best_k}")
+
+        # the curve, with the ks it skipped, for plot_elbow.py
+        name = os.path.splitext(os.path.basename(os.path.normpath(args.round)))[0] if args.round else 'weights'
+        with open(f'./tests/data/wcss_{name}.json', 'w') as outfile:
+            json.dump({
+                'ks': wcss_ks,
+                'wcss': wcss,
+                'skipped': adaptive['skipped'] if adaptive is not None else [],
+                'knee': best_k
+            }, outfile, indent=4)
+
+        # Save the Elbow method graph
+        fig, ax = render.axes('elbow', figsize=(10,5))
+        ax.plot(wcss_ks, wcss, marker='o', linestyle='--')
+        ax.set_title('Elbow Method')
+        ax.set_xlabel('Number of clusters')
+        ax.set_ylabel('WCSS')
+        render.save(fig, './tests/plots/python/elbow_method.png', dpi=100)
 
     # Save GMM BIC and AIC scores as plots
-    x = range(2, 11)
-    plt.plot(x, bic_scores, '-o', label='BIC')
-    plt.plot(x, aic_scores, '-o', label='AIC')
-    plt.xlabel('Number of Components')
-    plt.ylabel('Scores')
-    plt.title('GMM BIC and AIC scores per number of components')
-    plt.legend()
-    plt.savefig('./tests/plots/python/gmm_scores.png')
-    plt.clf()
\ No newline at end of file
+    fig, ax = render.axes('gmm_scores')
+    ax.plot(gmm_ks, bic_scores, '-o', label='BIC')
+    ax.plot(gmm_ks, aic_scores, '-o', label='AIC')
+    ax.set_xlabel('Number of Components')
+    ax.set_ylabel('Scores')
+    ax.set_title('GMM BIC and AIC scores per number of components')
+    ax.legend()
+    render.save(fig, './tests/plots/python/gmm_scores.png', dpi=100)
+
+    render.release()
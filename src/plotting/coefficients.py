@@ -0,0 +1,61 @@
+import numpy as np
+
+import render
+
+# above this many voters the per-voter coefficients are summarized per
+# cluster instead of drawn as one bar per voter
+MAX_BARS = 200
+# the voters shown by the top-N bar view
+TOP_VOTERS = 50
+
+VIEWS = ['bars', 'hist', 'ecdf', 'top']
+
+# one histogram of the coefficients per cluster, on shared bins
+def plot_coefficient_histogram(coefficients, assignments, path, title, bins=50):
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+    assignments = np.asarray(assignments)
+    edges = np.histogram_bin_edges(coefficients, bins=bins)
+
+    fig, ax = render.axes('coefficient_distribution')
+    for cluster in np.unique(assignments):
+        counts, _ = np.histogram(coefficients[assignments == cluster], bins=edges)
+        ax.stairs(counts, edges, label=f'Cluster {cluster + 1}')
+
+    ax.set_title(title)
+    ax.set_xlabel('Coefficient')
+    ax.set_ylabel('Voters')
+    ax.legend(fontsize=6)
+    render.save(fig, path)
+
+# the empirical CDF of the coefficients of every cluster
+def plot_coefficient_ecdf(coefficients, assignments, path, title):
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+    assignments = np.asarray(assignments)
+
+    fig, ax = render.axes('coefficient_distribution')
+    for cluster in np.unique(assignments):
+        values = np.sort(coefficients[assignments == cluster])
+        ax.step(values, np.arange(1, len(values) + 1) / len(values), where='post', label=f'Cluster {cluster + 1}')
+
+    ax.set_title(title)
+    ax.set_xlabel('Coefficient')
+    ax.set_ylabel('Fraction of voters')
+    ax.legend(fontsize=6)
+    render.save(fig, path)
+
+# one bar for each of the top voters by coefficient, labelled with the
+# (1-based) voter number
+def plot_top_coefficients(coefficients, path, title, color, top=TOP_VOTERS):
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+    top = min(top, len(coefficients))
+    voters = np.argpartition(-coefficients, top - 1)[:top]
+    voters = voters[np.argsort(-coefficients[voters], kind='stable')]
+
+    fig, ax = render.axes('coefficients')
+    ax.bar(list(range(1, top+1)), coefficients[voters], color=color)
+    ax.set_title(f'{title} (top {top} of {len(coefficients)} voters)')
+    ax.set_xlabel('Voters')
+    ax.set_xticks(list(range(1, top+1)), [str(voter + 1) for voter in voters])
+    ax.tick_params(axis='x', labelrotation=90, labelsize=4)
+    ax.set_ylabel('Coefficient')
+    render.save(fig, path)
@@ -0,0 +1,41 @@
+import numpy as np
+from scipy.sparse import issparse
+
+# collapse identical ballots (rows) into unique rows
+# @return (index, counts, inverse): the row index of the first occurrence of
+# each unique ballot (in the order they first occur), how many voters cast
+# it, and the unique ballot of every voter, so that data[index][inverse]
+# has the rows of data
+def unique_ballots(data):
+    if not issparse(data):
+        _, index, inverse, counts = np.unique(np.asarray(data), axis=0, return_index=True, return_inverse=True, return_counts=True)
+        # np.unique sorts the rows, put them back in the order of their first voter
+        order = np.argsort(index)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(order.size)
+        return index[order], counts[order], rank[inverse.ravel()]
+
+    data = data.tocsr()
+    if not data.has_sorted_indices:
+        data = data.sorted_indices()
+
+    # a ballot is identified by the projects it votes for and their weights
+    # @note explicit zeros are kept, so eliminate_zeros() first if the
+    # matrix may hold any
+    seen = {}
+    index = []
+    inverse = np.empty(data.shape[0], dtype=np.int64)
+    for row in range(data.shape[0]):
+        start, end = data.indptr[row], data.indptr[row+1]
+        ballot = (data.indices[start:end].tobytes(), data.data[start:end].tobytes())
+        unique = seen.setdefault(ballot, len(seen))
+        if unique == len(index):
+            index.append(row)
+        inverse[row] = unique
+
+    counts = np.bincount(inverse, minlength=len(index))
+    return np.asarray(index), counts, inverse
+
+# the labels of every voter, given the labels of the unique ballots
+def expand_labels(labels, inverse):
+    return np.asarray(labels)[inverse]
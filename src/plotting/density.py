@@ -0,0 +1,122 @@
+import argparse
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import radius_neighbors_graph
+from hdbscan import HDBSCAN
+# @note private, but the only way to re-extract the clusters of an already
+# built tree for another min_cluster_size
+from hdbscan.hdbscan_ import _tree_to_labels
+
+from ballots import load_round_matrix
+from dedupe import unique_ballots, expand_labels
+from tracing import traced
+
+# the DBSCAN labels of one eps, given the radius neighbor graph of a
+# larger (or equal) eps
+# @note the same labels as sklearn's DBSCAN: clusters are numbered by their
+# first core point and a border point joins the first cluster reaching it
+def dbscan_labels(graph, eps, min_samples=5, sample_weight=None):
+    voters = graph.shape[0]
+    # the edges within eps, the rows stay sorted so no CSR has to be rebuilt
+    keep = graph.data <= eps
+    rows = np.repeat(np.arange(voters), np.diff(graph.indptr))[keep]
+    cols = graph.indices[keep]
+
+    # every point is in its own neighborhood
+    weights = np.ones(voters) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    core = np.bincount(rows, weights=weights[cols], minlength=voters) + weights >= min_samples
+
+    labels = np.full(voters, -1)
+    if not core.any():
+        return labels
+
+    # the clusters are the connected components of the core points, which
+    # scipy numbers by their first point (the other points are left alone)
+    inner = core[rows] & core[cols]
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows[inner], minlength=voters))))
+    _, components = connected_components(csr_matrix((np.ones(inner.sum(), dtype=bool), cols[inner], indptr), shape=(voters, voters)), directed=False)
+    _, labels[core] = np.unique(components[core], return_inverse=True)
+
+    # every other point within eps of a core point joins the lowest numbered
+    # of those clusters
+    outer = ~core[rows] & core[cols]
+    if outer.any():
+        border_rows = rows[outer]
+        starts = np.flatnonzero(np.concatenate(([True], border_rows[1:] != border_rows[:-1])))
+        labels[border_rows[starts]] = np.minimum.reduceat(labels[cols[outer]], starts)
+
+    return labels
+
+# the DBSCAN labels of every eps from a single radius neighbor graph
+# built at the largest eps; each smaller eps only keeps the shorter edges
+# @note identical ballots are collapsed first (they share their
+# neighborhood), otherwise the graph has a clique per repeated ballot
+@traced
+def dbscan_sweep(data, eps_values, min_samples=5, sample_weight=None):
+    inverse = None
+    if sample_weight is None:
+        index, sample_weight, inverse = unique_ballots(data)
+        data = data[index]
+
+    # mode='distance' keeps the explicit zero distances
+    graph = radius_neighbors_graph(data, radius=max(eps_values), mode='distance')
+    labels = {}
+    for eps in eps_values:
+        labels[eps] = dbscan_labels(graph, eps, min_samples, sample_weight)
+        if inverse is not None:
+            # the unique ballots keep the order of their first voter, so the
+            # clusters keep sklearn's numbering
+            labels[eps] = expand_labels(labels[eps], inverse)
+
+    return labels
+
+# the HDBSCAN labels of every min_cluster_size from a single mutual
+# reachability tree (min_cluster_size only affects the cluster extraction)
+# @note the rows are densified first: on sparse input hdbscan falls back to
+# its generic algorithm, which builds the voters x voters distance matrix,
+# while on dense rows it builds the tree with Boruvka over a space tree, so
+# memory is O(voters * projects) instead of O(voters^2)
+@traced
+def hdbscan_sweep(data, min_cluster_sizes, min_samples=5):
+    # the hdbscan extensions only take doubles
+    data = data.toarray() if issparse(data) else data
+    data = np.asarray(data, dtype=np.float64)
+    model = HDBSCAN(min_samples=min_samples, min_cluster_size=min(min_cluster_sizes)).fit(data)
+    tree = model.single_linkage_tree_.to_numpy()
+    labels = {}
+    for min_cluster_size in min_cluster_sizes:
+        labels[min_cluster_size] = _tree_to_labels(data, tree, min_cluster_size)[0]
+
+    return labels
+
+# one row per setting: the number of clusters and the noise fraction
+# @param labels {setting: labels} as returned by the sweeps
+def density_table(labels):
+    rows = []
+    for setting in sorted(labels):
+        setting_labels = np.asarray(labels[setting])
+        rows.append({
+            'setting': setting,
+            'clusters': len(np.unique(setting_labels[setting_labels >= 0])),
+            'noise': float(np.mean(setting_labels < 0))
+        })
+
+    return rows
+
+# print the rows of density_table, headed by the name of the setting
+def print_table(name, rows):
+    print(f'{name:>16} {"clusters":>8} {"noise":>7}')
+    for row in rows:
+        print(f"{row['setting']:>16} {row['clusters']:>8} {row['noise']:>7.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='DBSCAN eps and HDBSCAN min_cluster_size sweeps over a round')
+    parser.add_argument('round', help='a mainnet_votes_parsed_*.json file or its converted round store')
+    args = parser.parse_args()
+
+    data = load_round_matrix(args.round)
+    eps_values = [round(float(x), 2) for x in np.linspace(0.1, 1.0, 10)]
+    print_table('DBSCAN eps', density_table(dbscan_sweep(data, eps_values)))
+    print_table('min_cluster_size', density_table(hdbscan_sweep(data, list(range(2, 12)))))
@@ -54,7 +54,8 @@ def plot_by_user_coefficient(coefficients, voters, path, title, color):
     # Add a title and labels to the axes
     plt.title(title)
     plt.xlabel('Voters')
-    plt.xticks(list(range(1, voters+1)))
+    # at most 50 ticks, the tick layout dominates the render time otherwise
+    plt.xticks(list(range(1, voters+1, max(-(-voters // 50), 1))))
     plt.xticks(rotation=90)
     plt.tick_params(axis='x', labelsize=4)
     plt.ylabel('Coefficient')
@@ -69,7 +70,8 @@ def plot_by_qf_distribution(qf, projects, path, title, color):
     # Add a title and labels to the axes
     plt.title(title)
     plt.xlabel('Projects')
-    plt.xticks(list(range(1, projects+1)))
+    # at most 50 ticks, the tick layout dominates the render time otherwise
+    plt.xticks(list(range(1, projects+1, max(-(-projects // 50), 1))))
     plt.xticks(rotation=90)
     plt.tick_params(axis='x', labelsize=4)
     plt.ylabel('QF')
@@ -84,7 +86,8 @@ def plot_by_trad_qf_distribution(trad_qf, projects, k):
     # Add a title and labels to the axes
     plt.title(f'Traditional QF per project k = {k}')
     plt.xlabel('Projects')
-    plt.xticks(list(range(1, projects+1)))
+    # at most 50 ticks, the tick layout dominates the render time otherwise
+    plt.xticks(list(range(1, projects+1, max(-(-projects // 50), 1))))
     plt.xticks(rotation=90)
     plt.tick_params(axis='x', labelsize=4)
     plt.ylabel('QF')
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import sys
+
+import matplotlib
+
+import results_store
+from tracing import TRACE
+
+# bump to rebuild every figure, e.g. when the fingerprint itself changes
+FINGERPRINT_VERSION = 2
+# the fingerprint of a figure is written next to it, in <figure><SIDECAR>
+SIDECAR = '.fingerprint.json'
+# the outputs of every job, by job, so a job can be skipped before it runs
+JOBS_DIR = './tests/data/render_jobs'
+
+# the render layer changes every figure drawn through it
+RENDER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'render.py')
+
+# the files opened while tracking, {'inputs': set(), 'outputs': set()}
+_tracking = None
+_hooked = False
+# the digests of the files hashed by this process, by (path, mtime_ns, size)
+_digests = {}
+
+# files read by the libraries themselves (sources, fonts, caches) are not
+# inputs of a figure
+_ignored = tuple(os.path.abspath(path) + os.sep for path in {
+    sys.prefix, sys.base_prefix, sys.exec_prefix, matplotlib.get_cachedir(), matplotlib.get_configdir(), '/proc', '/sys', '/dev'
+})
+
+def _audit(event, args):
+    if event != 'open' or _tracking is None:
+        return
+    path, mode, flags = args
+    if not isinstance(path, (str, bytes)):
+        # an already open file descriptor
+        return
+    path = os.path.abspath(os.fsdecode(path))
+    if mode is not None:
+        writing = any(flag in mode for flag in 'wax+')
+    else:
+        writing = bool(flags & (os.O_WRONLY | os.O_RDWR))
+
+    if writing:
+        # the trace of the run is not an output of the job
+        if TRACE is None or path != os.path.abspath(TRACE):
+            _tracking['outputs'].add(path)
+    elif not path.startswith(_ignored) and not path.endswith(('.py', '.pyc')) and not _is_store_file(path):
+        _tracking['inputs'].add(path)
+
+# the data and index of a results store are not inputs themselves: every
+# ingest rewrites them, the runs read from them are recorded instead
+def _is_store_file(path):
+    directory, filename = os.path.split(path)
+    return filename in results_store.STORE_FILES and os.path.exists(os.path.join(directory, 'index.json'))
+
+# record every file opened for reading (the inputs) and writing (the
+# outputs), and every run read from a results store, until the tracking stops
+# @note an audit hook cannot be removed, it is installed once per process
+# and does nothing while no job is tracked
+# @note a store already open in this process is not opened again, which is
+# why its runs are declared by read_output rather than seen by the hook
+def start_tracking():
+    global _tracking, _hooked
+    if not _hooked:
+        sys.addaudithook(_audit)
+        _hooked = True
+    results_store.served.clear()
+    _tracking = {'inputs': set(), 'outputs': set()}
+
+# @return (inputs, outputs, runs): the files as sorted paths relative to the
+# working directory, and the stored runs read as {run id: digest}
+def stop_tracking():
+    global _tracking
+    tracked, _tracking = _tracking, None
+    inputs = tracked['inputs'] - tracked['outputs']
+    runs = dict(results_store.served)
+    results_store.served.clear()
+    return (
+        sorted(os.path.relpath(path) for path in inputs),
+        sorted(os.path.relpath(path) for path in tracked['outputs']),
+        runs
+    )
+
+# the sha256 of a file, None when it does not exist
+# @note memoized by (path, mtime_ns, size), so the script, the render layer
+# and the inputs shared by many jobs are only hashed once per process
+def file_digest(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    stamp = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if stamp not in _digests:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as infile:
+            for block in iter(lambda: infile.read(2**20), b''):
+                digest.update(block)
+        _digests[stamp] = digest.hexdigest()
+    return _digests[stamp]
+
+# the fingerprint of a job: its script and arguments, the render layer, the
+# matplotlib version, the content of every input file it read and the
+# digest of every stored run it read
+def job_fingerprint(job, inputs, runs):
+    description = {
+        'version': FINGERPRINT_VERSION,
+        'script': file_digest(job['script']),
+        'args': [str(x) for x in job.get('args', [])],
+        'render': file_digest(RENDER_SOURCE),
+        'matplotlib': matplotlib.__version__,
+        'inputs': {path: file_digest(path) for path in inputs},
+        'runs': runs
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+# the file listing the outputs of a job
+def job_path(job, jobs_dir=JOBS_DIR):
+    key = json.dumps([job['script'], [str(x) for x in job.get('args', [])]])
+    return os.path.join(jobs_dir, hashlib.sha1(key.encode()).hexdigest() + '.json')
+
+# whether every figure of the job's last run is still there and was drawn
+# from the same script, arguments and inputs
+def up_to_date(job, jobs_dir=JOBS_DIR):
+    path = job_path(job, jobs_dir)
+    if not os.path.exists(path):
+        return False
+    with open(path) as infile:
+        record = json.load(infile)
+    if not record['outputs']:
+        return False
+
+    # the runs as they are stored now
+    runs = {stored_run: results_store.stored_run_digest(stored_run) for stored_run in record.get('runs', {})}
+    fingerprint = job_fingerprint(job, record['inputs'], runs)
+    for output in record['outputs']:
+        sidecar = output + SIDECAR
+        if not os.path.exists(output) or not os.path.exists(sidecar):
+            return False
+        with open(sidecar) as infile:
+            if json.load(infile)['fingerprint'] != fingerprint:
+                return False
+
+    return True
+
+# write the fingerprint next to every output of a job, and the job record
+def record_job(job, inputs, outputs, runs, jobs_dir=JOBS_DIR):
+    fingerprint = job_fingerprint(job, inputs, runs)
+    for output in outputs:
+        with open(output + SIDECAR, 'w') as outfile:
+            json.dump({
+                'fingerprint': fingerprint,
+                'script': job['script'],
+                'args': [str(x) for x in job.get('args', [])],
+                'inputs': inputs,
+                'runs': runs
+            }, outfile, indent=4)
+
+    os.makedirs(jobs_dir, exist_ok=True)
+    with open(job_path(job, jobs_dir), 'w') as outfile:
+        json.dump({
+            'script': job['script'],
+            'args': job.get('args', []),
+            'inputs': inputs,
+            'runs': runs,
+            'outputs': outputs
+        }, outfile, indent=4)
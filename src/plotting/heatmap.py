@@ -1,11 +1,108 @@
-import json 
-import seaborn as sns 
-import matplotlib.pyplot as plt
+import argparse
+import json
+import os
+
+import numpy as np
+from scipy.sparse import issparse
+
+import render
+from ballots import load_round_matrix
+
+# load a voters x projects matrix without reading it all: .npy files are
+# memory-mapped, round stores are memory-mapped CSR arrays and parsed
+# rounds are built as a sparse matrix; anything else is a dense JSON matrix
+def load_matrix(path):
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if os.path.isdir(path) or os.path.basename(path).startswith('mainnet_votes_parsed_'):
+        return load_round_matrix(path, dtype=None)
+    with open(path) as infile:
+        return np.asarray(json.load(infile), dtype=np.float64)
+
+# the start of every bin when splitting n items into at most `bins` bins
+def bin_starts(n, bins):
+    return np.unique(np.linspace(0, n, min(bins, n) + 1).astype(int))[:-1]
+
+# downsample the matrix into at most max_rows x max_cols pixels, taking the
+# max (or mean) of every bin, reading at most tile_rows rows at a time
+# @param order the row order (e.g. sorted by cluster), defaults to as stored
+# @param window (row_start, row_end, col_start, col_end) of the (ordered)
+# matrix to render, defaults to all of it
+def bin_matrix(data, order=None, max_rows=1000, max_cols=1000, agg='max', window=None, tile_rows=4096):
+    voters, projects = data.shape
+    row_start, row_end, col_start, col_end = window or (0, voters, 0, projects)
+    rows = np.arange(voters) if order is None else np.asarray(order)
+    rows = rows[row_start:row_end]
+    row_starts = bin_starts(len(rows), max_rows)
+    col_starts = bin_starts(col_end - col_start, max_cols)
+    row_ends = np.append(row_starts[1:], len(rows))
+    col_sizes = np.diff(np.append(col_starts, col_end - col_start))
+
+    image = np.zeros((len(row_starts), len(col_starts)))
+    first = 0
+    while first < len(row_starts):
+        # whole row bins only, so no bin is split across two tiles
+        last = first + 1
+        while last < len(row_starts) and row_ends[last] - row_starts[first] <= tile_rows:
+            last += 1
+        tile = data[rows[row_starts[first]:row_ends[last-1]]]
+        tile = tile[:, col_start:col_end]
+        tile = tile.toarray() if issparse(tile) else np.asarray(tile, dtype=np.float64)
+
+        starts = row_starts[first:last] - row_starts[first]
+        if agg == 'max':
+            image[first:last] = np.maximum.reduceat(np.maximum.reduceat(tile, starts, axis=0), col_starts, axis=1)
+        else:
+            sums = np.add.reduceat(np.add.reduceat(tile, starts, axis=0), col_starts, axis=1)
+            counts = np.outer(row_ends[first:last] - row_starts[first:last], col_sizes)
+            image[first:last] = sums / counts
+        first = last
+
+    return image, row_starts
+
+# draw the binned matrix as a single imshow raster, with a line between
+# every cluster when the rows are sorted by cluster
+def plot_heatmap(image, filename, boundaries=None, title=None):
+    # not `boundaries or []`: the boundaries of a clustering are an array
+    boundaries = [] if boundaries is None else boundaries
+    fig, ax = render.axes('heatmap', figsize=(10, 8))
+    artist = ax.imshow(image, cmap='viridis', vmin=0, aspect='auto', interpolation='nearest')
+    for boundary in boundaries:
+        ax.axhline(boundary - 0.5, color='w', linewidth=0.5)
+    ax.set_xlabel('Projects')
+    ax.set_ylabel('Voters (binned)')
+    if title:
+        ax.set_title(title)
+
+    # the colorbar goes in an inset of the axes, so it does not shrink the
+    # reused axes and is cleared with them
+    fig.colorbar(artist, cax=ax.inset_axes([1.02, 0, 0.03, 1]))
+    render.save(fig, filename, bbox_inches='tight')
 
 if __name__ == "__main__":
-    with open("./tests/data/weights.json") as infile:
-        data = json.load(infile)
+    parser = argparse.ArgumentParser(description='Heatmap of a voters x projects matrix, binned into a single raster')
+    parser.add_argument('matrix', nargs='?', default='./tests/data/weights.json', help='a JSON matrix, a .npy file, a parsed round or a round store')
+    parser.add_argument('--assignments', help='a JSON file with the cluster "assignments" of every voter, to sort the rows by cluster')
+    parser.add_argument('--agg', choices=['max', 'mean'], default='max', help='how to combine the cells of a bin')
+    parser.add_argument('--pixels', type=int, nargs=2, default=[1000, 1000], metavar=('ROWS', 'COLS'), help='the largest image size')
+    parser.add_argument('--window', type=int, nargs=4, metavar=('ROW_START', 'ROW_END', 'COL_START', 'COL_END'), help='only render this tile of the (sorted) matrix')
+    parser.add_argument('--output', default='./tests/data/heatmap.png')
+    args = parser.parse_args()
+
+    data = load_matrix(args.matrix)
+    order = None
+    boundaries = []
+    if args.assignments:
+        with open(args.assignments) as infile:
+            assignments = np.asarray(json.load(infile)['assignments'])
+        order = np.argsort(assignments, kind='stable')
+
+    image, row_starts = bin_matrix(data, order, args.pixels[0], args.pixels[1], args.agg, args.window)
+    if order is not None:
+        # the first pixel row of every cluster after the first
+        row_start, row_end = args.window[:2] if args.window else (0, len(order))
+        sorted_assignments = assignments[order][row_start:row_end]
+        changes = np.flatnonzero(np.diff(sorted_assignments)) + 1
+        boundaries = np.unique(np.searchsorted(row_starts, changes, side='right') - 1)[1:] if len(changes) else []
 
-    sns.heatmap(data, cmap='viridis', vmin=0)  # You can set other parameters as needed
-    plt.savefig("./tests/data/heatmap.png", dpi=300, bbox_inches='tight')
-    
\ No newline at end of file
+    plot_heatmap(image, args.output, boundaries, f'{data.shape[0]} voters x {data.shape[1]} projects ({args.agg} per bin)')
@@ -0,0 +1,124 @@
+import argparse
+import json
+
+import numpy as np
+from scipy.sparse import issparse
+from sklearn.cluster import KMeans, MiniBatchKMeans, kmeans_plusplus
+
+from ballots import load_round_matrix, scale
+from sweep import cluster_sizes
+from knee import adaptive_sweep
+
+# rounds with more voters than this are fitted with mini-batch updates
+MINIBATCH_ABOVE = 20000
+
+# squared euclidean distance of every point to its closest center
+def closest_squared_distances(data, centers):
+    squares = np.asarray(data.multiply(data).sum(axis=1)).ravel() if issparse(data) else np.square(data).sum(axis=1)
+    products = np.asarray(data @ centers.T)
+    squared = squares[:, None] - 2 * products + np.square(centers).sum(axis=1)
+    return np.maximum(squared.min(axis=1), 0)
+
+# add one k-means++ draw to the centers: a point picked with probability
+# proportional to its (weighted) squared distance to the closest center
+def add_center(data, centers, rng, sample_weight=None):
+    distances = closest_squared_distances(data, centers)
+    if sample_weight is not None:
+        distances = distances * sample_weight
+    total = distances.sum()
+    if total == 0:
+        # every point sits on a center already, any point will do
+        index = rng.integers(data.shape[0])
+    else:
+        index = rng.choice(data.shape[0], p=distances / total)
+
+    row = data[index].toarray() if issparse(data) else data[index][None, :]
+    return np.vstack([centers, row])
+
+# fit KMeans for every k in increasing order, seeding each k+1 from the
+# centers of k plus a single k-means++ draw instead of a fresh k-means++
+# seeding; a generator, so a caller can stop the sweep early
+# @param minibatch whether to use mini-batch updates (defaults to rounds
+# larger than MINIBATCH_ABOVE)
+# @param sample_weight the weight of every row, e.g. the number of voters
+# who cast each unique ballot
+# @return yields (k, result) in the sweep result format, with the number of
+# passes over the data each k took
+def warm_fits(data, ks, minibatch=None, batch_size=4096, random_state=0, sample_weight=None):
+    ks = sorted(ks)
+    voters = data.shape[0]
+    if minibatch is None:
+        minibatch = voters > MINIBATCH_ABOVE
+    rng = np.random.default_rng(random_state)
+
+    centers = None
+    for k in ks:
+        passes = 0
+        if centers is None:
+            # a regular k-means++ seeding for the first k
+            centers, _ = kmeans_plusplus(data, ks[0], sample_weight=sample_weight, random_state=random_state)
+            passes += ks[0]
+        while len(centers) < k:
+            centers = add_center(data, centers, rng, sample_weight)
+            passes += 1
+
+        if minibatch:
+            model = MiniBatchKMeans(n_clusters=k, init=centers, n_init=1, batch_size=batch_size, random_state=random_state)
+            labels = model.fit_predict(data, sample_weight=sample_weight)
+            # the steps, plus the final pass computing the labels and inertia
+            passes += model.n_steps_ * batch_size / voters + 1
+        else:
+            model = KMeans(n_clusters=k, init=centers, n_init=1, random_state=random_state)
+            labels = model.fit_predict(data, sample_weight=sample_weight)
+            passes += model.n_iter_
+
+        centers = model.cluster_centers_
+        result = {'algorithm': 'kmeans', 'param': k, 'inertia': float(model.inertia_), 'passes': float(passes)}
+        result['labels'] = [int(x) for x in labels]
+        result['sizes'], result['noise'] = cluster_sizes(labels)
+        yield k, result
+
+# every warm-started fit at once, {k: result}
+def warm_sweep(data, ks, minibatch=None, batch_size=4096, random_state=0, sample_weight=None):
+    return dict(warm_fits(data, ks, minibatch, batch_size, random_state, sample_weight))
+
+# fit KMeans for every k in increasing order, each from a fresh k-means++
+# seeding like the regular sweep; a generator like warm_fits
+def full_fits(data, ks, sample_weight=None):
+    for k in sorted(ks):
+        model = KMeans(n_clusters=k, init='k-means++')
+        labels = model.fit_predict(data, sample_weight=sample_weight)
+        result = {'algorithm': 'kmeans', 'param': k, 'inertia': float(model.inertia_), 'passes': float(model.n_iter_)}
+        result['labels'] = [int(x) for x in labels]
+        result['sizes'], result['noise'] = cluster_sizes(labels)
+        yield k, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Warm-started KMeans elbow curve over a round')
+    parser.add_argument('round', help='a mainnet_votes_parsed_*.json file or its converted round store')
+    parser.add_argument('output', help='JSON file receiving the WCSS and passes of every k')
+    parser.add_argument('--scaler', choices=['standard', 'maxabs'], default='standard', help='how to scale the weights')
+    parser.add_argument('--adaptive', action='store_true', help='stop once the knee of the WCSS curve is confirmed')
+    parser.add_argument('--margin', type=int, default=2, help='how many ks past the knee to fit before stopping')
+    parser.add_argument('--minibatch', action='store_true', default=None, help='force mini-batch updates (automatic above 20000 voters)')
+    args = parser.parse_args()
+
+    data = scale(load_round_matrix(args.round), args.scaler)
+    ks = list(range(3, 21))
+    fits = warm_fits(data, ks, args.minibatch)
+    if args.adaptive:
+        sweep = adaptive_sweep(fits, ks, args.margin)
+    else:
+        results = dict(fits)
+        sweep = {'ks': ks, 'wcss': [results[k]['inertia'] for k in ks], 'results': results, 'knee': None, 'skipped': []}
+    for k in sweep['ks']:
+        print(f"k={k} wcss={sweep['results'][k]['inertia']:.2f} passes={sweep['results'][k]['passes']:.1f}")
+
+    with open(args.output, 'w') as outfile:
+        json.dump({
+            'ks': sweep['ks'],
+            'elbows': sweep['wcss'],
+            'passes': [sweep['results'][k]['passes'] for k in sweep['ks']],
+            'knee': sweep['knee'],
+            'skipped': sweep['skipped']
+        }, outfile, indent=4)
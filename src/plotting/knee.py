@@ -0,0 +1,53 @@
+import numpy as np
+
+# the Kneedle difference curve of a decreasing, convex WCSS curve: how far
+# each (normalized) point lies below the chord from the first to the last one
+def difference_curve(ks, wcss):
+    ks = np.asarray(ks, dtype=np.float64)
+    wcss = np.asarray(wcss, dtype=np.float64)
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    spread = wcss.max() - wcss.min()
+    y = (wcss - wcss.min()) / spread if spread > 0 else np.zeros_like(wcss)
+    return x, (1 - x) - y
+
+# the knee of the curve so far (Satopaa et al., 2011)
+# @return (index, confirmed): the index of the knee candidate (None with
+# fewer than three points) and whether a later point already dropped below
+# the candidate's threshold, i.e. the knee can no longer move by adding
+# points right after it
+def find_knee(ks, wcss, sensitivity=1.0):
+    if len(ks) < 3:
+        return None, False
+
+    x, difference = difference_curve(ks, wcss)
+    # the first and last points always lie on the chord
+    index = int(np.argmax(difference[1:-1])) + 1
+    threshold = difference[index] - sensitivity * np.mean(np.diff(x))
+    confirmed = bool(np.any(difference[index+1:] < threshold))
+    return index, confirmed
+
+# consume the fits of increasing k until the knee of the WCSS curve is
+# confirmed and `margin` more ks were fitted after it
+# @param fits an iterator of (k, result) with the WCSS in result['inertia'],
+# e.g. kmeans_sweep.warm_fits, which is only advanced as far as needed
+# @return {'ks', 'wcss', 'results', 'knee', 'skipped'}, skipped holds the ks
+# of the full range which were never fitted
+def adaptive_sweep(fits, ks, margin=2, sensitivity=1.0):
+    fitted, wcss, results = [], [], {}
+    index = None
+    for k, result in fits:
+        fitted.append(k)
+        wcss.append(result['inertia'])
+        results[k] = result
+
+        index, confirmed = find_knee(fitted, wcss, sensitivity)
+        if confirmed and len(fitted) - 1 - index >= margin:
+            break
+
+    return {
+        'ks': fitted,
+        'wcss': wcss,
+        'results': results,
+        'knee': fitted[index] if index is not None else None,
+        'skipped': [k for k in ks if k not in results]
+    }
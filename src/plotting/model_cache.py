@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import sklearn
+from scipy.sparse import issparse
+
+# bump when the stored format or the fit behind a key changes, older
+# entries then simply miss
+CACHE_VERSION = 2
+
+# sha256 of the matrix contents (shape, dtype and values), sparse or dense
+def matrix_digest(data):
+    digest = hashlib.sha256()
+    if issparse(data):
+        data = data.tocsr()
+        if not data.has_sorted_indices:
+            # the same matrix must hash the same whatever order it was built in
+            data = data.sorted_indices()
+        digest.update(f'csr {data.shape} {data.dtype}'.encode())
+        for array in (data.indptr, data.indices, data.data):
+            digest.update(np.ascontiguousarray(array).tobytes())
+    else:
+        data = np.ascontiguousarray(data)
+        digest.update(f'dense {data.shape} {data.dtype}'.encode())
+        digest.update(data.tobytes())
+
+    return digest.hexdigest()
+
+# the key of one fit: the input matrix, how it was preprocessed, the
+# algorithm and all of its hyperparameters
+def fit_key(digest, preprocessing, algorithm, params):
+    payload = json.dumps({
+        'version': CACHE_VERSION,
+        'sklearn': sklearn.__version__,
+        'data': digest,
+        'preprocessing': preprocessing,
+        'algorithm': algorithm,
+        'params': params
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def entry_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], f'{key}.npz')
+
+# the cached result of a fit, or None
+def get(cache_dir, key):
+    path = entry_path(cache_dir, key)
+    try:
+        with np.load(path) as entry:
+            result = json.loads(str(entry['meta']))
+            result['labels'] = [int(x) for x in entry['labels']]
+            result['sizes'] = [int(x) for x in entry['sizes']]
+    except (OSError, KeyError, ValueError):
+        # missing, or a truncated file from an interrupted write
+        return None
+
+    # mark it as recently used for the eviction
+    os.utime(path)
+    return result
+
+# store the result of a fit as a compressed npz
+def put(cache_dir, key, result):
+    path = entry_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    meta = {name: value for name, value in result.items() if name not in ('labels', 'sizes')}
+    labels = np.asarray(result['labels'])
+    # write to a temporary file first so a reader never sees a partial entry
+    with open(path + '.tmp', 'wb') as outfile:
+        np.savez_compressed(
+            outfile,
+            meta=np.array(json.dumps(meta)),
+            labels=labels.astype(np.int16 if labels.size == 0 or labels.max() < 2**15 else np.int32),
+            sizes=np.asarray(result['sizes'], dtype=np.int32)
+        )
+    os.replace(path + '.tmp', path)
+
+# the array cached under a key (e.g. a projection of the matrix), or None
+def get_array(cache_dir, key):
+    path = entry_path(cache_dir, key)
+    try:
+        with np.load(path) as entry:
+            array = entry['array']
+    except (OSError, KeyError, ValueError):
+        return None
+
+    os.utime(path)
+    return array
+
+# store an array as a cache entry, evicted like the fits
+def put_array(cache_dir, key, array):
+    path = entry_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as outfile:
+        np.savez_compressed(outfile, array=np.asarray(array))
+    os.replace(path + '.tmp', path)
+
+# delete the least recently used entries until the cache fits in max_bytes
+def evict(cache_dir, max_bytes):
+    entries = []
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if name.endswith('.npz'):
+                stat = os.stat(os.path.join(root, name))
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        evicted += 1
+
+    return evicted, total
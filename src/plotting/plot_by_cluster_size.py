@@ -1,6 +1,6 @@
-import matplotlib.pyplot as plt
 import json 
 import sys 
+import render
 
 # read data
 def read_data(): 
@@ -24,18 +24,19 @@ def parse_data():
 
 # plot the data
 def plot_by_size_of_clusters(k, sizes):
-    plt.bar(list(range(1, k+1)), sizes , color='g')
+    fig, ax = render.axes('sizes')
+    ax.bar(list(range(1, k+1)), sizes , color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Size of cluster for k = {k}'.format(k))
-    plt.xlabel('Clusters')
-    plt.xticks(list(range(1, k+1)))
-    plt.ylabel('Number of Ballots')
+    ax.set_title(f'Size of cluster for k = {k}')
+    ax.set_xlabel('Clusters')
+    ax.set_xticks(list(range(1, k+1)))
+    ax.set_ylabel('Number of Ballots')
 
     # save
-    plt.savefig(
+    render.save(fig,
         './tests/plots/gitcoin/k-6/{filename}_1_minus_sizes.png'
-        .format(filename=sys.argv[1], k=k), dpi=300
+        .format(filename=sys.argv[1], k=k)
     )
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
-import matplotlib.pyplot as plt
 import json 
 import sys 
+import render
 
 def read_data(): 
     with open(f'./tests/data/wcss_{sys.argv[1]}.json') as f:
@@ -8,21 +8,31 @@ def read_data():
 
     return data
 
-def plot_wcss(wcss):
-    plt.plot(list(range(1, len(wcss)+1)), wcss, color='g')
+# @param ks the fitted ks (an adaptive sweep stops early and skips the rest)
+def plot_wcss(wcss, ks, skipped=None, knee=None):
+    skipped = skipped or []
+    fig, ax = render.axes('wcss')
+    ax.plot(ks, wcss, color='g', marker='o')
+    if skipped:
+        ax.axvspan(min(skipped) - 0.5, max(skipped) + 0.5, color='grey', alpha=0.2, label='skipped')
+    if knee is not None:
+        ax.axvline(knee, color='k', linestyle='--', label=f'knee (k={knee})')
+    if skipped or knee is not None:
+        ax.legend()
 
     # Add a title and labels to the axes
-    plt.title(f'WCSS Elbow Method')
-    plt.xlabel('k')
-    plt.xticks(list(range(3, 11)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=6)
-    plt.ylabel('WCSS score')
+    ax.set_title(f'WCSS Elbow Method')
+    ax.set_xlabel('k')
+    ax.set_xticks(sorted(ks + skipped))
+    ax.tick_params(axis='x', labelrotation=90, labelsize=6)
+    ax.set_ylabel('WCSS score')
 
     # save
-    plt.savefig(f'./tests/plots/elbow_method_{sys.argv[1]}.png', dpi=300)
+    render.save(fig, f'./tests/plots/elbow_method_{sys.argv[1]}.png')
 
 if __name__ == "__main__":
     data = read_data()
 
-    plot_wcss(data['wcss'])
+    # the TS runs write k = 3..10 without listing the ks
+    ks = data.get('ks', list(range(3, 3 + len(data['wcss']))))
+    plot_wcss(data['wcss'], ks, data.get('skipped', []), data.get('knee'))
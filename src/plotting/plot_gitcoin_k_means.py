@@ -1,19 +1,15 @@
-import matplotlib.pyplot as plt
-import json 
 import sys 
+import render
+from results_store import read_output
 
 def read_data(): 
     k = sys.argv[1]
     iteration = sys.argv[2]
     filename = sys.argv[3]
-    with open(f"./tests/data/gitcoin/output/{filename}_output_k_means_k_{k}_{iteration}_one_minus_square_before.json") as one_minus_before:
-        one_minus_before_data = json.load(one_minus_before)
-    with open(f"./tests/data/gitcoin/output/{filename}_output_k_means_k_{k}_{iteration}_one_minus_square_after.json") as one_minus_after:
-        one_minus_after_data = json.load(one_minus_after)
-    with open(f"./tests/data/gitcoin/output/{filename}_output_k_means_k_{k}_{iteration}_square_before.json") as before:
-        before_data = json.load(before)
-    with open(f"./tests/data/gitcoin/output/{filename}_output_k_means_k_{k}_{iteration}_square_after.json") as after:
-        after_data = json.load(after)
+    one_minus_before_data = read_output(f"./tests/data/gitcoin/output/{filename}_output_k_means_k_{k}_{iteration}_one_minus_square_before.json")
+    one_minus_after_data = read_output(f"./tests/data/gitcoin/output/{filename}_output_k_means_k_{k}_{iteration}_one_minus_square_after.json")
+    before_data = read_output(f"./tests/data/gitcoin/output/{filename}_output_k_means_k_{k}_{iteration}_square_before.json")
+    after_data = read_output(f"./tests/data/gitcoin/output/{filename}_output_k_means_k_{k}_{iteration}_square_after.json")
 
     return one_minus_before_data,  one_minus_after_data, before_data, after_data
 
@@ -56,49 +52,48 @@ def parse_data():
     )
 
 def plot_by_size_of_clusters(k, sizes):
-    plt.bar(list(range(1, k+1)), sizes , color='g')
+    fig, ax = render.axes('sizes')
+    ax.bar(list(range(1, k+1)), sizes , color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Size of cluster for k = {k}'.format(k))
-    plt.xlabel('Clusters')
-    plt.xticks(list(range(1, k+1)))
-    plt.ylabel('Number of Ballots')
+    ax.set_title(f'Size of cluster for k = {k}')
+    ax.set_xlabel('Clusters')
+    ax.set_xticks(list(range(1, k+1)))
+    ax.set_ylabel('Number of Ballots')
 
     # save
-    plt.savefig(
+    render.save(fig,
         './tests/plots/gitcoin/{filename}_plot_k_means_plus_plus_k_{k}_{iteration}_1_minus_sizes.png'
-        .format(filename=sys.argv[3], k=k, iteration=sys.argv[2]), dpi=300
+        .format(filename=sys.argv[3], k=k, iteration=sys.argv[2])
     )
 
 def plot_by_qf_distribution(qf, projects, path, title, color):
-    fig, ax = plt.subplots()
+    fig, ax = render.axes('qf')
     ax.bar(list(range(1, projects+1)), qf, color=color)
 
     # Add a title and labels to the axes
-    plt.title(title)
-    plt.xlabel('Projects')
-    plt.xticks(list(range(1, projects+1)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=4)
-    plt.ylabel('QF')
+    ax.set_title(title)
+    ax.set_xlabel('Projects')
+    render.index_ticks(ax, projects)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=4)
+    ax.set_ylabel('QF')
 
     # save
-    plt.savefig(path, dpi=300)
+    render.save(fig, path)
 
 def plot_by_penalties(penalties, projects, path, title, color):
-    fig, ax = plt.subplots()
+    fig, ax = render.axes('penalties')
     ax.bar(list(range(1, projects+1)), penalties, color=color)
 
     # Add a title and labels to the axes
-    plt.title(title)
-    plt.xlabel('Projects')
-    plt.xticks(list(range(1, projects+1)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=4)
-    plt.ylabel('Penalties')
+    ax.set_title(title)
+    ax.set_xlabel('Projects')
+    render.index_ticks(ax, projects)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=4)
+    ax.set_ylabel('Penalties')
 
     # save
-    plt.savefig(path, dpi=300)
+    render.save(fig, path)
 
 if __name__ == "__main__":
     ( 
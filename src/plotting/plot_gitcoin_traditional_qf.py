@@ -1,11 +1,10 @@
-import matplotlib.pyplot as plt
-import json 
 import sys 
+import render
+from results_store import read_output
 
 def read_data(): 
     filename = sys.argv[1]
-    with open(f"./tests/data/gitcoin/output/{filename}") as one_minus_before:
-        one_minus_before_data = json.load(one_minus_before)
+    one_minus_before_data = read_output(f"./tests/data/gitcoin/output/{filename}")
 
     return one_minus_before_data
 
@@ -19,20 +18,19 @@ def parse_data():
 
 
 def plot_by_trad_qf_distribution(trad_qf, projects):
-    fig, ax = plt.subplots()
+    fig, ax = render.axes('trad_qf')
     ax.bar(list(range(1, projects+1)), trad_qf, color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Traditional QF per project')
-    plt.xlabel('Projects')
-    plt.xticks(list(range(1, projects+1)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=4)
-    plt.ylabel('QF')
+    ax.set_title(f'Traditional QF per project')
+    ax.set_xlabel('Projects')
+    render.index_ticks(ax, projects)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=4)
+    ax.set_ylabel('QF')
 
     # save
-    plt.savefig(
-        f'./tests/plots/gitcoin/k-6/{sys.argv[1]}_trad_qf.png', dpi=300
+    render.save(fig,
+        f'./tests/plots/gitcoin/k-6/{sys.argv[1]}_trad_qf.png'
     )
 
 if __name__ == "__main__":
@@ -1,18 +1,15 @@
-import matplotlib.pyplot as plt
-import json 
 import sys 
+import render
+from results_store import read_output
+from coefficients import MAX_BARS, VIEWS, plot_coefficient_ecdf, plot_coefficient_histogram, plot_top_coefficients
 
 def read_data(): 
     k = sys.argv[1]
     iteration = sys.argv[2]
-    with open(f"./tests/data/output_k_means_k_{k}_{iteration}_one_minus_square_before.json") as one_minus_before:
-        one_minus_before_data = json.load(one_minus_before)
-    with open(f"./tests/data/output_k_means_k_{k}_{iteration}_one_minus_square_after.json") as one_minus_after:
-        one_minus_after_data = json.load(one_minus_after)
-    with open(f"./tests/data/output_k_means_k_{k}_{iteration}_square_before.json") as before:
-        before_data = json.load(before)
-    with open(f"./tests/data/output_k_means_k_{k}_{iteration}_square_after.json") as after:
-        after_data = json.load(after)
+    one_minus_before_data = read_output(f"./tests/data/output_k_means_k_{k}_{iteration}_one_minus_square_before.json")
+    one_minus_after_data = read_output(f"./tests/data/output_k_means_k_{k}_{iteration}_one_minus_square_after.json")
+    before_data = read_output(f"./tests/data/output_k_means_k_{k}_{iteration}_square_before.json")
+    after_data = read_output(f"./tests/data/output_k_means_k_{k}_{iteration}_square_after.json")
 
     return one_minus_before_data,  one_minus_after_data, before_data, after_data
 
@@ -55,66 +52,76 @@ def parse_data():
     )
 
 def plot_by_size_of_clusters(k, sizes):
-    plt.bar(list(range(1, k+1)), sizes , color='g')
+    fig, ax = render.axes('sizes')
+    ax.bar(list(range(1, k+1)), sizes , color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Size of cluster for k = {k}'.format(k))
-    plt.xlabel('Clusters')
-    plt.xticks(list(range(1, k+1)))
-    plt.ylabel('Number of Ballots')
+    ax.set_title(f'Size of cluster for k = {k}')
+    ax.set_xlabel('Clusters')
+    ax.set_xticks(list(range(1, k+1)))
+    ax.set_ylabel('Number of Ballots')
 
     # save
-    plt.savefig(
+    render.save(fig,
         './tests/plots/plot_k_means_plus_plus_k_{k}_{iteration}_1_minus_sizes.png'
-        .format(k=k, iteration=sys.argv[2]), dpi=300
+        .format(k=k, iteration=sys.argv[2])
     )
 
 
-def plot_by_user_coefficient(coefficients, voters, path, title, color):
+# the coefficient of every voter: one bar per voter up to MAX_BARS voters,
+# then a histogram per cluster
+# @param view 'bars', 'hist', 'ecdf' (per cluster) or 'top' (the voters
+# with the highest coefficients)
+def plot_by_user_coefficient(coefficients, voters, path, title, color, assignments=None, view=None):
+    if view is None:
+        view = 'bars' if voters <= MAX_BARS or assignments is None else 'hist'
+    if view == 'hist':
+        return plot_coefficient_histogram(coefficients, assignments, path, title)
+    if view == 'ecdf':
+        return plot_coefficient_ecdf(coefficients, assignments, path, title)
+    if view == 'top':
+        return plot_top_coefficients(coefficients, path, title, color)
 
-    fig, ax = plt.subplots()
-    ax.bar(list(range(1, voters+1)), coefficients , color=color)
+    fig, ax = render.axes('coefficients')
+    ax.bar(list(range(1, voters+1)), coefficients, color=color)
 
     # Add a title and labels to the axes
-    plt.title(title)
-    plt.xlabel('Voters')
-    plt.xticks(list(range(1, voters+1)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=4)
-    plt.ylabel('Coefficient')
+    ax.set_title(title)
+    ax.set_xlabel('Voters')
+    render.index_ticks(ax, voters)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=4)
+    ax.set_ylabel('Coefficient')
 
     # save
-    plt.savefig(path, dpi=300)
+    render.save(fig, path)
 
 def plot_by_qf_distribution(qf, projects, path, title, color):
-    fig, ax = plt.subplots()
+    fig, ax = render.axes('qf')
     ax.bar(list(range(1, projects+1)), qf, color=color)
 
     # Add a title and labels to the axes
-    plt.title(title)
-    plt.xlabel('Projects')
-    plt.xticks(list(range(1, projects+1)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=4)
-    plt.ylabel('QF')
+    ax.set_title(title)
+    ax.set_xlabel('Projects')
+    render.index_ticks(ax, projects)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=4)
+    ax.set_ylabel('QF')
 
     # save
-    plt.savefig(path, dpi=300)
+    render.save(fig, path)
 
 def plot_by_penalties(penalties, projects, path, title, color):
-    fig, ax = plt.subplots()
+    fig, ax = render.axes('penalties')
     ax.bar(list(range(1, projects+1)), penalties, color=color)
 
     # Add a title and labels to the axes
-    plt.title(title)
-    plt.xlabel('Projects')
-    plt.xticks(list(range(1, projects+1)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=4)
-    plt.ylabel('Penalties')
+    ax.set_title(title)
+    ax.set_xlabel('Projects')
+    render.index_ticks(ax, projects)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=4)
+    ax.set_ylabel('Penalties')
 
     # save
-    plt.savefig(path, dpi=300)
+    render.save(fig, path)
 
 if __name__ == "__main__":
     ( 
@@ -135,10 +142,14 @@ if __name__ == "__main__":
         penalties_before,
         penalties_after
     ) = parse_data()
+    # the per-voter coefficient view, see plot_by_user_coefficient
+    view = sys.argv[3] if len(sys.argv) > 3 else None
+    if view is not None and view not in VIEWS:
+        raise ValueError(f"Unknown view {view}, expected one of {', '.join(VIEWS)}")
 
     plot_by_size_of_clusters(k, sizes)
-    plot_by_user_coefficient(userCoefficients_one_minus, voters, f'./tests/plots/plot_k_means_plus_plus_k_{sys.argv[1]}_{sys.argv[2]}_user_coefficients_1_minus.png', f'User coefficients (1 - clusterSize/ballots) for k = {k}', 'b')
-    plot_by_user_coefficient(userCoefficients, voters, f'./tests/plots/plot_k_means_plus_plus_k_{sys.argv[1]}_{sys.argv[2]}_user_coefficients.png', f'User coefficients (clusterSize/ballots) for k = {k}', 'b')
+    plot_by_user_coefficient(userCoefficients_one_minus, voters, f'./tests/plots/plot_k_means_plus_plus_k_{sys.argv[1]}_{sys.argv[2]}_user_coefficients_1_minus.png', f'User coefficients (1 - clusterSize/ballots) for k = {k}', 'b', assignments, view)
+    plot_by_user_coefficient(userCoefficients, voters, f'./tests/plots/plot_k_means_plus_plus_k_{sys.argv[1]}_{sys.argv[2]}_user_coefficients.png', f'User coefficients (clusterSize/ballots) for k = {k}', 'b', assignments, view)
 
     plot_by_qf_distribution(qfs_minus_before, projects, f'./tests/plots/plot_k_means_plus_plus_k_{sys.argv[1]}_{sys.argv[2]}_1_minus_square_before_coefficient.png', f'QF (1 - clusterSize/ballots and square root before coefficient) for k = {k}', 'b')
     plot_by_qf_distribution(qfs_minus_after, projects, f'./tests/plots/plot_k_means_plus_plus_k_{sys.argv[1]}_{sys.argv[2]}_1_minus_square_after_coefficient.png', f'QF (1 - clusterSize/ballots and square root after coefficient) for k = {k}', 'r')
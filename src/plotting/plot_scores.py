@@ -1,6 +1,6 @@
-import matplotlib.pyplot as plt
 import json 
 import sys 
+import render
 
 # read data
 def read_data(): 
@@ -17,8 +17,11 @@ def parse_data():
     db_scores = data['dbIndexes']
     wcss = data['elbows']
     dunn_scores = data['dunnScores']
+    # the score files of an adaptive sweep list the ks they reached
+    ks = data.get('ks', list(range(3, 11)))
 
     return (
+        ks,
         sil_scores,
         db_scores,
         wcss,
@@ -27,83 +30,73 @@ def parse_data():
 
 
 # plot the data
-def plot_by_dbScore(db_scores):
-    plt.bar(list(range(3, 11)), db_scores, color='g')
+def plot_by_dbScore(db_scores, ks):
+    fig, ax = render.axes('db_scores')
+    ax.bar(ks, db_scores, color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Davies Boul scores {sys.argv[1]}')
-    plt.xlabel('Clusters')
-    plt.xticks(list(range(3, 11)))
-    plt.ylabel('Score')
+    ax.set_title(f'Davies Boul scores {sys.argv[1]}')
+    ax.set_xlabel('Clusters')
+    ax.set_xticks(ks)
+    ax.set_ylabel('Score')
 
     # save
-    plt.savefig(
+    render.save(fig,
         f'./tests/plots/scores/daviesb_plot_{sys.argv[1]}.png'
-        , dpi=300
     )
 
-    plt.clf()
-
 # plot the data
-def plot_by_silhoutteScore(scores):
-    plt.bar(list(range(3, 11)), scores, color='g')
+def plot_by_silhoutteScore(scores, ks):
+    fig, ax = render.axes('silhoutte')
+    ax.bar(ks, scores, color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Silhoutte {sys.argv[1]}')
-    plt.xlabel('Clusters')
-    plt.xticks(list(range(3, 11)))
-    plt.ylabel('Score')
+    ax.set_title(f'Silhoutte {sys.argv[1]}')
+    ax.set_xlabel('Clusters')
+    ax.set_xticks(ks)
+    ax.set_ylabel('Score')
 
     # save
-    plt.savefig(
+    render.save(fig,
         f'./tests/plots/scores/silhoutte_plot_{sys.argv[1]}.png'
-        , dpi=300
     )
 
-    plt.clf()
-
 
-def plot_wcss(wcss):
-    plt.plot(list(range(3, 11)), wcss, color='g')
+def plot_wcss(wcss, ks):
+    fig, ax = render.axes('wcss')
+    ax.plot(ks, wcss, color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'WCSS Elbow Method')
-    plt.xlabel('k')
-    plt.xticks(list(range(3, 11)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=6)
-    plt.ylabel('WCSS score')
+    ax.set_title(f'WCSS Elbow Method')
+    ax.set_xlabel('k')
+    ax.set_xticks(ks)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=6)
+    ax.set_ylabel('WCSS score')
 
     # save
-    plt.savefig(
+    render.save(fig,
         f'./tests/plots/scores/elbow_plot_{sys.argv[1]}.png'
-        , dpi=300
     )
 
-    plt.clf()
-
-def plot_dunn(dunn):
-    plt.bar(list(range(3, 11)), dunn, color='g')
+def plot_dunn(dunn, ks):
+    fig, ax = render.axes('dunn')
+    ax.bar(ks, dunn, color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Dunn scores')
-    plt.xlabel('k')
-    plt.xticks(list(range(3, 11)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=6)
-    plt.ylabel('Dunn score')
+    ax.set_title(f'Dunn scores')
+    ax.set_xlabel('k')
+    ax.set_xticks(ks)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=6)
+    ax.set_ylabel('Dunn score')
 
     # save
-    plt.savefig(
+    render.save(fig,
         f'./tests/plots/scores/dunn_plot_{sys.argv[1]}.png'
-        , dpi=300
     )
 
-    plt.clf()
-
 if __name__ == "__main__":
-    sil_scores, db_scores, wcss, dunn_scores  = parse_data()
-    plot_by_silhoutteScore(sil_scores)
-    plot_by_dbScore(db_scores)
-    plot_wcss(wcss)
-    plot_dunn(dunn_scores)
+    ks, sil_scores, db_scores, wcss, dunn_scores  = parse_data()
+    plot_by_silhoutteScore(sil_scores, ks)
+    plot_by_dbScore(db_scores, ks)
+    plot_wcss(wcss, ks)
+    plot_dunn(dunn_scores, ks)
@@ -0,0 +1,78 @@
+
+import numpy as np
+from matplotlib import colormaps
+from scipy.sparse import issparse
+from sklearn.decomposition import PCA, TruncatedSVD
+
+import model_cache
+import render
+from tracing import traced
+
+# above this many voters a labelling is drawn as a binned density image
+# instead of one marker per voter
+MAX_POINTS = 20000
+
+# the projections computed in this process, by matrix digest
+_projections = {}
+
+# the 2-D randomized PCA projection of a matrix, fitted once per dataset:
+# kept in memory for this process and, with a cache_dir, as an entry of the
+# sweep cache (see model_cache.py), keyed by the digest of the matrix
+# @note sparse input goes through TruncatedSVD, which does not center the
+# data (centering would densify it)
+@traced
+def project(data, cache_dir=None):
+    digest = model_cache.matrix_digest(data)
+    if digest in _projections:
+        return _projections[digest]
+
+    # a cache entry like the fits, so it counts against the cache size
+    key = model_cache.fit_key(digest, 'none', 'projection', {'n_components': 2, 'solver': 'randomized', 'random_state': 0})
+    coordinates = model_cache.get_array(cache_dir, key) if cache_dir else None
+    if coordinates is None:
+        if issparse(data):
+            model = TruncatedSVD(n_components=2, algorithm='randomized', random_state=0)
+        else:
+            model = PCA(n_components=2, svd_solver='randomized', random_state=0)
+        coordinates = model.fit_transform(data)
+        if cache_dir:
+            model_cache.put_array(cache_dir, key, coordinates)
+
+    _projections[digest] = coordinates
+    return coordinates
+
+# an RGBA image of the labelling: each bin takes the color of its most
+# common cluster, with an opacity growing with the (log) number of voters
+# in it
+def density_image(coordinates, labels, bins=200, cmap='rainbow'):
+    labels = np.asarray(labels)
+    clusters, cluster_index = np.unique(labels, return_inverse=True)
+    x, y = coordinates[:, 0], coordinates[:, 1]
+    x_edges = np.linspace(x.min(), x.max(), bins + 1)
+    y_edges = np.linspace(y.min(), y.max(), bins + 1)
+    x_bin = np.clip(np.searchsorted(x_edges, x, side='right') - 1, 0, bins - 1)
+    y_bin = np.clip(np.searchsorted(y_edges, y, side='right') - 1, 0, bins - 1)
+
+    # one bincount over (cluster, y bin, x bin) gives every per cluster histogram
+    flat = (cluster_index * bins + y_bin) * bins + x_bin
+    counts = np.bincount(flat, minlength=len(clusters) * bins * bins).reshape(len(clusters), bins, bins)
+    totals = counts.sum(axis=0)
+    dominant = counts.argmax(axis=0)
+
+    image = colormaps[cmap](dominant / max(len(clusters) - 1, 1))
+    # every occupied bin stays visible, empty ones are transparent
+    image[..., 3] = np.where(totals > 0, 0.3 + 0.7 * np.log1p(totals) / np.log1p(totals.max()), 0)
+    return image, (x_edges[0], x_edges[-1], y_edges[0], y_edges[-1])
+
+# draw a labelling on the 2-D projection, as rasterized markers or, above
+# max_points voters, as a single density image so the render time does not
+# grow with the number of voters
+def plot_projection(coordinates, labels, title, filename, max_points=MAX_POINTS, dpi=100):
+    fig, ax = render.axes('clusters')
+    if len(coordinates) > max_points:
+        image, extent = density_image(coordinates, labels)
+        ax.imshow(image, extent=extent, origin='lower', aspect='auto', interpolation='nearest')
+    else:
+        ax.scatter(coordinates[:, 0], coordinates[:, 1], c=labels, cmap='rainbow', s=4, rasterized=True)
+    ax.set_title(title)
+    render.save(fig, filename, dpi=dpi)
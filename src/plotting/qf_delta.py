@@ -0,0 +1,257 @@
+import argparse
+import time
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+from allocations import VARIANTS, allocate, cluster_coefficients, cluster_root_sums, cluster_sizes
+from ballots import load_round_matrix
+from results_store import read_output
+
+# keep the QF of a round up to date while single ballots are inserted,
+# updated or deleted, instead of reallocating every ballot
+# @note with S_k the sum of sqrt(weight) of cluster k, n_k its size and N the
+# number of voters, the four variants only need running sums per project:
+#   square_before            (sum_k n_k S_k / N)^2
+#   square_after             (sum_k sqrt(n_k) S_k)^2 / N
+#   one_minus_square_before  (T - sum_k n_k S_k / N)^2, T = sum_k S_k
+#   one_minus_square_after   (sum_k sqrt(1 - n_k/N) S_k)^2
+# an update costs O(projects + k) for every variant; an insert or delete
+# costs O(projects + k) for tradQFs and three variants, but O(k * projects)
+# for one_minus_square_after, whose every coefficient moves with N
+# @note an empty cluster has no sqrt(weight) to weigh, so the TS coefficient
+# of 1 for empty clusters never shows up in the sums; a one_minus coefficient
+# of 0 (one cluster holding every voter) is 1 like in cluster_coefficients,
+# so both one_minus variants are then the traditional QF
+class QFDelta:
+    # @param weights the voters x projects vote weights (dense or sparse)
+    # @param assignments the cluster index of each voter
+    def __init__(self, weights, assignments, k=None):
+        assignments = np.asarray(assignments)
+        self.k = int(assignments.max()) + 1 if k is None else k
+        roots = weights.sqrt().tocsr() if hasattr(weights, 'sqrt') else np.sqrt(np.asarray(weights, dtype=np.float64))
+        self.projects = roots.shape[1]
+
+        # the ballot (project indices, sqrt weights) and cluster of every
+        # voter, None once deleted
+        self.ballots = []
+        for row in range(roots.shape[0]):
+            if hasattr(roots, 'indices'):
+                ballot = roots[row]
+                self.ballots.append((ballot.indices.copy(), ballot.data.astype(np.float64)))
+            else:
+                nonzero = np.flatnonzero(roots[row])
+                self.ballots.append((nonzero, roots[row][nonzero]))
+        self.assignments = [int(x) for x in assignments]
+
+        self.sizes = cluster_sizes(assignments[None, :], self.k)[0].astype(np.int64)
+        self.root_sums = cluster_root_sums(roots, assignments[None, :], self.k)[0]
+        self.voters = len(self.assignments)
+        self.rebuild()
+
+    # recompute the running sums and the QF from the per-cluster sums, e.g.
+    # to drop the rounding error of a long run of changes
+    def rebuild(self):
+        self.column_sums = self.root_sums.sum(axis=0)
+        self.size_sums = self.sizes @ self.root_sums
+        self.root_size_sums = np.sqrt(self.sizes) @ self.root_sums
+        self.one_minus_after_sums = self._one_minus_roots() @ self.root_sums
+        self.qfs = self._qfs()
+
+    # sqrt(1 - n_k/N) for every cluster
+    def _one_minus_roots(self):
+        if self.voters == 0:
+            return np.ones(self.k)
+        roots = np.sqrt(1 - self.sizes / self.voters)
+        roots[roots == 0] = 1
+        return roots
+
+    # tradQFs and the qfs of every variant from the running sums
+    def _qfs(self, projects=slice(None)):
+        voters = max(self.voters, 1)
+        columns = self.column_sums[projects]
+        one_minus_before = columns - self.size_sums[projects] / voters
+        if self.voters and np.any(self.sizes == self.voters):
+            one_minus_before = columns
+        return {
+            'tradQFs': np.square(columns),
+            'one_minus_square_before': np.square(one_minus_before),
+            'one_minus_square_after': np.square(self.one_minus_after_sums[projects]),
+            'square_before': np.square(self.size_sums[projects] / voters),
+            'square_after': np.square(self.root_size_sums[projects]) / voters
+        }
+
+    # move the sqrt weights of a ballot into (sign 1) or out of (sign -1) a
+    # cluster, keeping every running sum but one_minus_square_after in step
+    def _move(self, ballot, cluster, sign):
+        indices, roots = ballot
+        roots = sign * roots
+        self.root_sums[cluster, indices] += roots
+        self.column_sums[indices] += roots
+        self.size_sums[indices] += self.sizes[cluster] * roots
+        self.root_size_sums[indices] += np.sqrt(self.sizes[cluster]) * roots
+
+    # change the size of a cluster, keeping the sums weighted by the size
+    def _resize(self, cluster, change):
+        old = self.sizes[cluster]
+        self.sizes[cluster] += change
+        self.size_sums += change * self.root_sums[cluster]
+        self.root_size_sums += (np.sqrt(self.sizes[cluster]) - np.sqrt(old)) * self.root_sums[cluster]
+
+    # the entries of the qfs and penalties that changed since the last
+    # change, {'tradQFs': {project: qf}, <variant>: {'qfs': {...}, 'penalties': {...}}}
+    def _changes(self, projects):
+        if projects is None:
+            projects = np.arange(self.projects)
+        new = self._qfs(projects)
+        changes = {}
+        for name, qfs in new.items():
+            changed = qfs != self.qfs[name][projects]
+            self.qfs[name][projects] = qfs
+            changed_projects = projects[changed]
+            if name == 'tradQFs':
+                changes[name] = dict(zip(changed_projects.tolist(), qfs[changed].tolist()))
+            else:
+                changes[name] = {'qfs': dict(zip(changed_projects.tolist(), qfs[changed].tolist()))}
+
+        # a penalty changes when the traditional QF or the variant's QF does
+        trad_qfs = self.qfs['tradQFs']
+        for name in VARIANTS:
+            changed = np.union1d(list(changes['tradQFs']), list(changes[name]['qfs'])).astype(np.int64)
+            changes[name]['penalties'] = dict(zip(changed.tolist(), (trad_qfs[changed] - self.qfs[name][changed]).tolist()))
+
+        return changes
+
+    # the project indices and sqrt weights of a {project index: weight} ballot
+    def _ballot(self, ballot):
+        indices = np.fromiter(ballot.keys(), dtype=np.int64, count=len(ballot))
+        if indices.size and (indices.min() < 0 or indices.max() >= self.projects):
+            raise ValueError(f'A ballot can only vote for the projects 0 to {self.projects - 1}')
+        return indices, np.sqrt(np.fromiter(ballot.values(), dtype=np.float64, count=len(ballot)))
+
+    # add the ballot of a new voter to a cluster
+    # @note O(k * projects): one_minus_square_after is recomputed
+    # @return (the index of the new voter, the changed entries)
+    def insert(self, ballot, cluster):
+        ballot = self._ballot(ballot)
+        self.ballots.append(ballot)
+        self.assignments.append(cluster)
+        self._resize(cluster, 1)
+        self._move(ballot, cluster, 1)
+        self.voters += 1
+        # N moved: every one_minus_square_after coefficient did too
+        self.one_minus_after_sums = self._one_minus_roots() @ self.root_sums
+        return len(self.ballots) - 1, self._changes(None)
+
+    # replace the ballot of a voter, moving it to another cluster if given
+    # @return the changed entries
+    def update(self, voter, ballot, cluster=None):
+        old_ballot, old_cluster = self._voter(voter)
+        cluster = old_cluster if cluster is None else cluster
+        ballot = self._ballot(ballot)
+
+        old_roots = self._one_minus_roots()
+        self._move(old_ballot, old_cluster, -1)
+        self.one_minus_after_sums[old_ballot[0]] -= old_roots[old_cluster] * old_ballot[1]
+        new_roots = old_roots
+        if cluster != old_cluster:
+            # N is unchanged, only the coefficients of the two clusters moved
+            self._resize(old_cluster, -1)
+            self._resize(cluster, 1)
+            new_roots = self._one_minus_roots()
+            for moved in (old_cluster, cluster):
+                self.one_minus_after_sums += (new_roots[moved] - old_roots[moved]) * self.root_sums[moved]
+        self._move(ballot, cluster, 1)
+        self.one_minus_after_sums[ballot[0]] += new_roots[cluster] * ballot[1]
+        self.ballots[voter] = ballot
+        self.assignments[voter] = cluster
+
+        if cluster != old_cluster:
+            return self._changes(None)
+        return self._changes(np.union1d(old_ballot[0], ballot[0]))
+
+    # withdraw the ballot of a voter
+    # @note O(k * projects): one_minus_square_after is recomputed
+    # @return the changed entries
+    def delete(self, voter):
+        ballot, cluster = self._voter(voter)
+        self._move(ballot, cluster, -1)
+        self._resize(cluster, -1)
+        self.voters -= 1
+        self.ballots[voter] = None
+        self.assignments[voter] = None
+        self.one_minus_after_sums = self._one_minus_roots() @ self.root_sums
+        return self._changes(None)
+
+    def _voter(self, voter):
+        if voter >= len(self.ballots) or self.ballots[voter] is None:
+            raise KeyError(f'No ballot for voter {voter}')
+        return self.ballots[voter], self.assignments[voter]
+
+    # the current QF, like allocations.allocate: tradQFs, clustersSizes and
+    # {coefficients, qfs, penalties} per variant
+    def allocation(self):
+        output = {'tradQFs': self.qfs['tradQFs'].copy(), 'clustersSizes': self.sizes.copy()}
+        for name in VARIANTS:
+            coefficients = cluster_coefficients(self.sizes[None, :].astype(np.float64), max(self.voters, 1), name.startswith('one_minus_'))[0]
+            output[name] = {
+                'coefficients': coefficients,
+                'qfs': self.qfs[name].copy(),
+                'penalties': self.qfs['tradQFs'] - self.qfs[name]
+            }
+
+        return output
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Apply random single-ballot changes to a round and compare the delta QF with a full reallocation')
+    parser.add_argument('round', help='a mainnet_votes_parsed_*.json file or its converted round store')
+    parser.add_argument('k', type=int)
+    parser.add_argument('--assignments', help='an output file of the TS KMeans whose assignments are used (a KMeans fit otherwise)')
+    parser.add_argument('--changes', type=int, default=1000, help='the number of inserts, updates and deletes')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    weights = load_round_matrix(args.round).tocsr().astype(np.float64)
+    if args.assignments:
+        assignments = np.asarray(read_output(args.assignments)['assignments'])
+    else:
+        assignments = KMeans(n_clusters=args.k, n_init=1, random_state=args.seed).fit_predict(weights.sqrt())
+    engine = QFDelta(weights, assignments, args.k)
+
+    rng = np.random.default_rng(args.seed)
+    rows = [weights[row] for row in range(weights.shape[0])]
+    alive = list(range(weights.shape[0]))
+    changed = 0
+    start = time.perf_counter()
+    for _ in range(args.changes):
+        action = rng.choice(['insert', 'update', 'delete'])
+        row = rows[rng.integers(len(rows))]
+        ballot = dict(zip(row.indices.tolist(), row.data.tolist()))
+        if action == 'insert':
+            voter, changes = engine.insert(ballot, int(rng.integers(args.k)))
+            alive.append(voter)
+        else:
+            voter = alive[rng.integers(len(alive))]
+            if action == 'update':
+                changes = engine.update(voter, ballot)
+            else:
+                changes = engine.delete(voter)
+                alive.remove(voter)
+        changed += sum(len(x['qfs']) for name, x in changes.items() if name != 'tradQFs')
+    elapsed = time.perf_counter() - start
+    print(f'{args.changes} changes in {elapsed:.3f}s ({elapsed / args.changes * 1e6:.0f}us each), {changed / args.changes:.1f} changed qfs per change')
+
+    # the same round reallocated from scratch
+    kept = [voter for voter in range(len(engine.ballots)) if engine.ballots[voter] is not None]
+    dense = np.zeros((len(kept), engine.projects))
+    for i, voter in enumerate(kept):
+        indices, roots = engine.ballots[voter]
+        dense[i, indices] = np.square(roots)
+    start = time.perf_counter()
+    batch = allocate(dense, [engine.assignments[voter] for voter in kept], args.k)
+    print(f'full reallocation in {(time.perf_counter() - start) * 1e6:.0f}us')
+    live = engine.allocation()
+    for name in ['tradQFs'] + VARIANTS:
+        expected = batch[name] if name == 'tradQFs' else batch[name]['qfs']
+        actual = live[name] if name == 'tradQFs' else live[name]['qfs']
+        print(f'{name}: max relative difference {np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1)):.3g}')
@@ -0,0 +1,53 @@
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from tracing import span
+
+# one reusable figure per chart type, e.g. 'qf' or 'penalties'
+# @note these figures are not registered with pyplot, so nothing keeps
+# them alive once released
+_figures = {}
+
+# get the figure and axes for a chart type, cleared for the next chart
+# @note with nrows/ncols > 1 the axes are returned as a 2D array, like plt.subplots
+def axes(chart, figsize=None, nrows=1, ncols=1):
+    if chart not in _figures:
+        fig = Figure(figsize=figsize)
+        # always draw with the non-interactive Agg backend
+        FigureCanvasAgg(fig)
+        _figures[chart] = (fig, fig.subplots(nrows, ncols, squeeze=False))
+
+    fig, grid = _figures[chart]
+    for ax in grid.flat:
+        ax.clear()
+        # clear() keeps the tick parameters (rotation, label size) of the previous chart
+        # @note reset=True also turns on the top/right ticks, so turn them back off
+        ax.tick_params(axis='both', which='both', reset=True, top=False, right=False)
+    if figsize is not None:
+        fig.set_size_inches(figsize)
+
+    if grid.size == 1:
+        return fig, grid[0, 0]
+    return fig, grid
+
+# save the figure, then drop its artists and its raster buffer
+# (a 300 dpi canvas holds ~11MB until the next draw)
+def save(fig, path, dpi=300, **kwargs):
+    with span('savefig', path=path, dpi=dpi):
+        fig.savefig(path, dpi=dpi, **kwargs)
+    for ax in fig.axes:
+        ax.clear()
+    # a fresh canvas releases the renderer of the old one
+    FigureCanvasAgg(fig)
+
+# release every cached figure
+def release():
+    for fig, _ in _figures.values():
+        fig.clear()
+    _figures.clear()
+
+# tick at most max_ticks of the bar positions 1..n, so the tick layout does
+# not grow with the number of voters or projects
+def index_ticks(ax, n, max_ticks=50):
+    step = -(-n // max_ticks)
+    ax.set_xticks(list(range(1, n+1, max(step, 1))))
@@ -0,0 +1,270 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+# the version written in the index of a results store
+RESULTS_VERSION = 1
+# how many output files are parsed before they are appended to the store
+INGEST_BATCH = 256
+
+# the per-run files of the TS sweeps:
+# [<round>_]output_k_means_k_<k>_<iteration>_<variant>.json
+OUTPUT_FILE = re.compile(r'^(?:(?P<round>.+)_)?output_(?P<mode>k_means)_k_(?P<k>\d+)_(?P<iteration>\d+)_(?P<variant>[a-z_]+)\.json$')
+
+# the store of the output files of a directory, kept next to them
+def store_path(output_dir):
+    return os.path.join(output_dir, 'results')
+
+# the run key of an output file name, None if it is not one
+def run_key(filename):
+    match = OUTPUT_FILE.match(filename)
+    if match is None:
+        return None
+    return '/'.join([match['round'] or '', match['mode'], match['k'], match['iteration'], match['variant']])
+
+# the output file name of a run key
+def run_filename(key):
+    round_name, mode, k, iteration, variant = key.split('/')
+    prefix = f'{round_name}_' if round_name else ''
+    return f'{prefix}output_{mode}_k_{k}_{iteration}_{variant}.json'
+
+# a numeric array for a list of numbers (or a rectangular list of lists),
+# None for anything else
+def as_array(value):
+    if not isinstance(value, list) or not value:
+        return None
+    try:
+        array = np.asarray(value)
+    except ValueError:
+        # ragged lists
+        return None
+    if array.dtype.kind not in 'biuf':
+        return None
+    return array.astype(np.int64 if array.dtype.kind in 'biu' else np.float64)
+
+# one array per column for a list of numeric records (e.g. the clustersSizes
+# [{index, size}]), None for anything else
+def as_columns(value):
+    if not isinstance(value, list) or not value or not all(isinstance(x, dict) for x in value):
+        return None
+    columns = {column: as_array([x.get(column) for x in value]) for column in value[0]}
+    if any(array is None for array in columns.values()):
+        return None
+    return columns
+
+# an append-only results store: the arrays of every run in a single binary
+# file, each distinct array written once (the assignments, sizes and project
+# counts shared by the four variants of a run are stored a single time), and
+# a JSON index of the runs by (round, mode, k, iteration, variant)
+class ResultsStore:
+    def __init__(self, path):
+        self.path = path
+        self.data_path = os.path.join(path, 'data.bin')
+        self.index_path = os.path.join(path, 'index.json')
+        self._data = None
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as infile:
+                self.index = json.load(infile)
+            if self.index['version'] != RESULTS_VERSION:
+                raise ValueError(f"Unsupported results store version {self.index['version']} in {path}")
+        else:
+            self.index = {'version': RESULTS_VERSION, 'arrays': {}, 'runs': {}}
+        # the (mtime_ns, size) of the output file each run was read from
+        self.index.setdefault('sources', {})
+
+    def __contains__(self, key):
+        return key in self.index['runs']
+
+    def keys(self):
+        return list(self.index['runs'])
+
+    # append an array to the data file, unless the same one is stored already
+    # @return its digest
+    def _put_array(self, array, data_file):
+        array = np.ascontiguousarray(array)
+        digest = hashlib.sha1(f'{array.dtype.str}{array.shape}'.encode() + array.tobytes()).hexdigest()
+        if digest not in self.index['arrays']:
+            # every array starts 8-byte aligned
+            data_file.write(bytes(-data_file.tell() % 8))
+            offset = data_file.tell()
+            data_file.write(array.tobytes())
+            self.index['arrays'][digest] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        return digest
+
+    # a lazy view of a stored array, nothing is read until it is used
+    def _get_array(self, digest):
+        if self._data is None:
+            self._data = np.memmap(self.data_path, dtype=np.uint8, mode='r')
+        entry = self.index['arrays'][digest]
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape']))
+        return np.frombuffer(self._data, dtype=dtype, count=count, offset=entry['offset']).reshape(entry['shape'])
+
+    # the (mtime_ns, size) a run was stored from, None if unknown
+    def source(self, key):
+        source = self.index['sources'].get(key)
+        return None if source is None else tuple(source)
+
+    # add runs to the store, {key: the parsed output file}, replacing the
+    # runs stored under the same keys
+    # @param sources the (mtime_ns, size) of the file of each run, by key
+    # @note the index is replaced atomically after the data is appended, so
+    # an interrupted write leaves the store as it was
+    def add(self, runs, sources=None):
+        sources = sources or {}
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.data_path, 'ab') as data_file:
+            for key, run in runs.items():
+                fields = {}
+                for name, value in run.items():
+                    array = as_array(value)
+                    columns = as_columns(value) if array is None else None
+                    if array is not None:
+                        fields[name] = {'array': self._put_array(array, data_file)}
+                    elif columns is not None:
+                        fields[name] = {'columns': {
+                            column: self._put_array(values, data_file) for column, values in columns.items()
+                        }}
+                    else:
+                        fields[name] = {'value': value}
+                self.index['runs'][key] = fields
+                if key in sources:
+                    self.index['sources'][key] = list(sources[key])
+                else:
+                    self.index['sources'].pop(key, None)
+
+        # the old file map does not cover the appended bytes
+        self._data = None
+        temporary = self.index_path + '.tmp'
+        with open(temporary, 'w') as outfile:
+            json.dump(self.index, outfile)
+        os.replace(temporary, self.index_path)
+
+    # one field of a run
+    def field(self, key, name):
+        field = self.index['runs'][key][name]
+        if 'array' in field:
+            return self._get_array(field['array'])
+        if 'columns' in field:
+            columns = {column: self._get_array(digest) for column, digest in field['columns'].items()}
+            rows = len(next(iter(columns.values())))
+            return [{column: values[i].item() for column, values in columns.items()} for i in range(rows)]
+        return field['value']
+
+    # a run like its output file, with the numeric lists as (lazy) arrays
+    def run(self, key):
+        return {name: self.field(key, name) for name in self.index['runs'][key]}
+
+# the (mtime_ns, size) of a file, which tells a rerun apart from the run
+# that was stored
+def file_stamp(file_path):
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+# consolidate the output files of a directory into its store: new runs are
+# added, and runs whose file changed since they were stored are replaced
+# @param delete remove every output file once the store holds its content
+# @return the number of runs added or replaced
+def ingest(output_dir, path=None, delete=False):
+    store = ResultsStore(path or store_path(output_dir))
+    files = {}
+    for filename in sorted(os.listdir(output_dir)):
+        key = run_key(filename)
+        file_path = os.path.join(output_dir, filename)
+        if key is not None and store.source(key) != file_stamp(file_path):
+            files[key] = file_path
+
+    # a batch of files at a time, so neither every parsed file is held in
+    # memory nor the index rewritten after every one
+    keys = list(files)
+    for start in range(0, len(keys), INGEST_BATCH):
+        runs = {}
+        sources = {}
+        for key in keys[start:start + INGEST_BATCH]:
+            # the stamp from before the read, so a file rewritten meanwhile
+            # does not pass for stored
+            sources[key] = file_stamp(files[key])
+            with open(files[key]) as infile:
+                runs[key] = json.load(infile)
+        store.add(runs, sources)
+
+    if delete:
+        # only the files whose content is the stored one
+        for filename in os.listdir(output_dir):
+            key = run_key(filename)
+            file_path = os.path.join(output_dir, filename)
+            if key is not None and store.source(key) == file_stamp(file_path):
+                os.remove(file_path)
+
+    return len(files)
+
+# the files of a store, see fingerprint.py
+STORE_FILES = ('data.bin', 'index.json', 'index.json.tmp')
+
+# the runs read_output served from a store, {run id: digest}, which the
+# render jobs record as their inputs (see fingerprint.py)
+served = {}
+
+# the id of a stored run, <store path>#<run key>
+def run_id(path, key):
+    return f'{path}#{key}'
+
+# the digest of a stored run: its index entry names the digest of every array
+def run_digest(store, key):
+    return hashlib.sha1(json.dumps(store.index['runs'][key], sort_keys=True).encode()).hexdigest()
+
+# the current digest of the run with this id, None when it is not stored
+def stored_run_digest(stored_run):
+    path, key = stored_run.rsplit('#', 1)
+    if not os.path.exists(os.path.join(path, 'index.json')):
+        return None
+    store = open_store(path)
+    return run_digest(store, key) if key in store else None
+
+# the stores opened by read_output, by path: (index stamp, store)
+_stores = {}
+
+# the store at a path, reopened when its index changed since it was opened
+def open_store(path):
+    stamp = file_stamp(os.path.join(path, 'index.json'))
+    if path not in _stores or _stores[path][0] != stamp:
+        _stores[path] = (stamp, ResultsStore(path))
+    return _stores[path][1]
+
+# read an output file: from the store next to it when it holds the run,
+# from the JSON file when there is none or when the file is not the one
+# that was stored (e.g. a rerun not ingested yet)
+def read_output(file_path):
+    output_dir, filename = os.path.split(file_path)
+    key = run_key(filename)
+    path = store_path(output_dir)
+    if key is not None and os.path.exists(os.path.join(path, 'index.json')):
+        store = open_store(path)
+        if key in store and (not os.path.exists(file_path) or store.source(key) == file_stamp(file_path)):
+            served[run_id(path, key)] = run_digest(store, key)
+            return store.run(key)
+
+    with open(file_path) as infile:
+        return json.load(infile)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Consolidate the per-run output files of the TS sweeps into one results store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help='add the output files of a directory to its store')
+    ingest_parser.add_argument('output_dir', help='e.g. ./tests/data/gitcoin/output')
+    ingest_parser.add_argument('--delete', action='store_true', help='remove the output files once they are stored')
+    list_parser = subparsers.add_parser('list', help='print the output file name of every stored run')
+    list_parser.add_argument('output_dir')
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        added = ingest(args.output_dir, delete=args.delete)
+        print(f'{added} runs added to {store_path(args.output_dir)}')
+    else:
+        store = ResultsStore(store_path(args.output_dir))
+        for key in store.keys():
+            print(run_filename(key))
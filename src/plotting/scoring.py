@@ -0,0 +1,146 @@
+import json
+import sys
+
+import numpy as np
+from scipy.sparse import issparse
+from sklearn.cluster import KMeans
+from sklearn.metrics import pairwise_distances_chunked
+from sklearn.preprocessing import normalize
+
+from ballots import load_round_matrix
+from tracing import traced
+
+# the k range the TS scorers use
+KS = list(range(3, 21))
+
+# the per cluster running totals one labelling needs while the pairwise
+# distances stream past
+class _Labelling:
+    def __init__(self, labels):
+        # relabel to 0..k-1 so empty clusters never show up
+        self.clusters, self.labels = np.unique(labels, return_inverse=True)
+        self.k = len(self.clusters)
+        self.sizes = np.bincount(self.labels, minlength=self.k)
+        # sort the columns by cluster so reduceat works on contiguous blocks
+        self.order = np.argsort(self.labels, kind='stable')
+        self.starts = np.concatenate(([0], np.cumsum(self.sizes)[:-1]))
+        self.silhouettes = np.zeros(len(self.labels))
+        self.min_inter = np.inf
+        self.max_diameter = 0.0
+
+    def update(self, rows, distances):
+        own = self.labels[rows]
+        index = np.arange(len(rows))
+        blocks = distances[:, self.order]
+        sums = np.add.reduceat(blocks, self.starts, axis=1)
+        mins = np.minimum.reduceat(blocks, self.starts, axis=1)
+        maxs = np.maximum.reduceat(blocks, self.starts, axis=1)
+
+        # silhouette: a = mean distance to the own cluster, b = smallest mean
+        # distance to another cluster (0 for singleton clusters, like sklearn)
+        own_sizes = self.sizes[own]
+        a = sums[index, own] / np.maximum(own_sizes - 1, 1)
+        means = sums / self.sizes
+        means[index, own] = np.inf
+        b = means.min(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            s = (b - a) / np.maximum(a, b)
+        s[(own_sizes == 1) | ~np.isfinite(s)] = 0
+        self.silhouettes[rows] = s
+
+        # dunn: smallest distance between clusters over the largest diameter
+        maxs = maxs[index, own]
+        mins[index, own] = np.inf
+        self.min_inter = min(self.min_inter, mins.min())
+        self.max_diameter = max(self.max_diameter, maxs.max())
+
+    def silhouette(self):
+        return float(self.silhouettes.mean())
+
+    def dunn(self):
+        if self.max_diameter == 0:
+            return 0.0
+        return float(self.min_inter / self.max_diameter)
+
+# distances between every point and every centroid (voters x k)
+def centroid_distances(data, centroids, metric):
+    products = np.asarray(data @ centroids.T)
+    if metric == 'cosine':
+        norms = np.sqrt(np.asarray(data.multiply(data).sum(axis=1)).ravel()) if issparse(data) else np.linalg.norm(data, axis=1)
+        centroid_norms = np.linalg.norm(centroids, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            similarities = products / np.outer(norms, centroid_norms)
+        # a zero vector has no direction, the TS code counts it as similarity 0
+        return 1 - np.nan_to_num(similarities)
+
+    squares = np.asarray(data.multiply(data).sum(axis=1)).ravel() if issparse(data) else np.square(data).sum(axis=1)
+    squared = squares[:, None] - 2 * products + np.square(centroids).sum(axis=1)
+    return np.sqrt(np.maximum(squared, 0))
+
+# wcss (squared euclidean, or 1 - cosine similarity) and Davies-Bouldin index
+def centroid_scores(data, labelling, metric):
+    onehot = np.zeros((labelling.k, len(labelling.labels)))
+    onehot[labelling.labels, np.arange(len(labelling.labels))] = 1
+    centroids = np.asarray(onehot @ data) / labelling.sizes[:, None]
+
+    distances = centroid_distances(data, centroids, metric)
+    own = distances[np.arange(len(labelling.labels)), labelling.labels]
+    wcss = np.sum(own) if metric == 'cosine' else np.sum(np.square(own))
+
+    # average distance of each cluster to its centroid
+    spread = np.bincount(labelling.labels, weights=own, minlength=labelling.k) / labelling.sizes
+    separation = centroid_distances(centroids, centroids, metric)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratios = (spread[:, None] + spread[None, :]) / separation
+    np.fill_diagonal(ratios, -np.inf)
+    ratios[~np.isfinite(ratios)] = -np.inf
+    db_index = float(np.mean(np.maximum(ratios.max(axis=1), 0))) if labelling.k > 1 else 0.0
+
+    return float(wcss), db_index
+
+# fit one KMeans per k (on unit rows for cosine)
+def fit_labellings(data, ks, metric):
+    if metric == 'cosine':
+        data = normalize(data)
+    return {k: KMeans(n_clusters=k, init='k-means++').fit_predict(data) for k in ks}
+
+# compute the silhouette, Davies-Bouldin, WCSS and Dunn scores of every k
+# while computing the pairwise distances only once, in chunks of at most
+# working_memory MB
+# @param labellings {k: labels}, fitted with KMeans when not passed
+@traced
+def score_round(data, labellings=None, metric='euclidean', working_memory=256):
+    if labellings is None:
+        labellings = fit_labellings(data, KS, metric)
+
+    ks = sorted(labellings)
+    states = [_Labelling(labellings[k]) for k in ks]
+
+    start = 0
+    for chunk in pairwise_distances_chunked(data, metric=metric, working_memory=working_memory):
+        rows = np.arange(start, start + chunk.shape[0])
+        # a point is at distance 0 from itself, even a zero ballot under cosine
+        chunk[np.arange(chunk.shape[0]), rows] = 0
+        for state in states:
+            state.update(rows, chunk)
+        start += chunk.shape[0]
+
+    scores = {'ks': ks, 'silhoutteScores': [], 'dbIndexes': [], 'elbows': [], 'dunnScores': []}
+    for state in states:
+        wcss, db_index = centroid_scores(data, state, metric)
+        scores['silhoutteScores'].append(state.silhouette())
+        scores['dbIndexes'].append(db_index)
+        scores['elbows'].append(wcss)
+        scores['dunnScores'].append(state.dunn())
+
+    return scores
+
+if __name__ == "__main__":
+    # python3 src/plotting/scoring.py <round json or store> <euclidean|cosine> <output json>
+    path, metric, output = sys.argv[1], sys.argv[2], sys.argv[3]
+    # cluster on sqrt(weight), like the TS KMeans
+    data = load_round_matrix(path).sqrt()
+    scores = score_round(data, metric=metric)
+
+    with open(output, 'w') as outfile:
+        json.dump(scores, outfile, indent=4)
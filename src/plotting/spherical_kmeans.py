@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+from sklearn.preprocessing import normalize
+
+from ballots import load_round_matrix
+
+# the defaults of the TS KMeans (src/ts/utilities.ts)
+TOLERANCE = 0.01
+MAX_ITERATIONS = 100
+
+# the cosine similarity of every (unit) ballot to every centroid (voters x k)
+def similarities(units, centroids):
+    return np.asarray(units @ normalize(centroids).T)
+
+# the given rows as a dense array
+def dense_rows(data, indexes):
+    rows = data[indexes]
+    return rows.toarray() if issparse(rows) else np.array(rows)
+
+# k-means++ seeding on the cosine distance, like calculateInitialCentroidsPlusPlusCosine:
+# a random first ballot, then each next one with probability proportional to
+# 1 - its highest similarity to the centroids picked so far
+def seed_plus_plus(units, k, rng):
+    voters = units.shape[0]
+    # an empty ballot has no direction, so it can never be a centroid
+    candidates = np.asarray(abs(units).sum(axis=1)).ravel() > 0
+    if candidates.sum() < k:
+        raise ValueError('The number of clusters cannot be greater than the number of non-empty ballots')
+
+    indexes = [int(rng.choice(np.flatnonzero(candidates)))]
+    distances = 1 - similarities(units, dense_rows(units, indexes)).ravel()
+    while len(indexes) < k:
+        weights = np.maximum(distances, 0) * candidates
+        weights[indexes] = 0
+        if weights.sum() == 0:
+            # fewer distinct directions than clusters, take any other ballot
+            weights = candidates.astype(np.float64)
+            weights[indexes] = 0
+        index = int(rng.choice(voters, p=weights / weights.sum()))
+        indexes.append(index)
+        distances = np.minimum(distances, 1 - similarities(units, dense_rows(units, [index])).ravel())
+
+    return dense_rows(units, indexes)
+
+# spherical k-means: the rows are normalized once, every assignment is a
+# single matrix product against the centroids and every centroid is the
+# direction of the sum of its unit ballots
+# @note the TS KMeans averages the unnormalized sqrt weights instead, so
+# larger ballots pull its centroids further; the assignments only depend
+# on the directions either way
+# @return {'assignments', 'sizes', 'iterations', 'wcss'}
+def spherical_kmeans(data, k, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS, random_state=None):
+    rng = np.random.default_rng(random_state)
+    units = normalize(data)
+    voters = units.shape[0]
+    centroids = seed_plus_plus(units, k, rng)
+
+    iterations = max_iterations
+    for i in range(max_iterations):
+        assignments = similarities(units, centroids).argmax(axis=1)
+
+        onehot = csr_matrix((np.ones(voters), (assignments, np.arange(voters))), shape=(k, voters))
+        sums = np.asarray((onehot @ units).todense()) if issparse(units) else onehot @ units
+        # an empty cluster keeps its previous centroid
+        empty = np.bincount(assignments, minlength=k) == 0
+        sums[empty] = centroids[empty]
+        previous, centroids = centroids, normalize(sums)
+
+        # converged once every centroid moved by less than the tolerance,
+        # like checkConvergenceCosine
+        moved = 1 - np.sum(normalize(previous) * centroids, axis=1)
+        if np.all(np.abs(moved) <= tolerance):
+            iterations = i + 1
+            break
+
+    scores = similarities(units, centroids)
+    assignments = scores.argmax(axis=1)
+    sizes = np.bincount(assignments, minlength=k)
+    return {
+        'assignments': [int(x) for x in assignments],
+        'sizes': [{'index': index, 'size': int(size)} for index, size in enumerate(sizes)],
+        'iterations': iterations,
+        'wcss': float(np.sum(1 - scores[np.arange(voters), assignments]))
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Spherical (cosine) k-means over a round, written like the TS cosine outputs')
+    parser.add_argument('round', help='a mainnet_votes_parsed_*.json file or its converted round store')
+    parser.add_argument('ks', type=int, nargs='+', help='the numbers of clusters')
+    # not the TS outputs themselves, which these are compared against
+    parser.add_argument('--output', default='./tests/data/gitcoin/python_cosine', help='directory receiving data_<round>_k_<k>-means.json')
+    args = parser.parse_args()
+
+    # cluster on sqrt(weight), like the TS KMeans
+    data = load_round_matrix(args.round).sqrt()
+    name = os.path.splitext(os.path.basename(os.path.normpath(args.round)))[0].replace('mainnet_votes_parsed_', '')
+    os.makedirs(args.output, exist_ok=True)
+    for k in args.ks:
+        result = spherical_kmeans(data, k)
+        print(f"k={k}: {result['iterations']} iterations, WCSS {result['wcss']:.2f}")
+        with open(os.path.join(args.output, f'data_{name}_k_{k}-means.json'), 'w') as outfile:
+            json.dump(result, outfile, indent=4)
@@ -0,0 +1,183 @@
+import argparse
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.cluster import KMeans
+
+from allocations import allocate, cluster_coefficients, cluster_root_sums
+from ballots import load_round_matrix
+
+# a full recluster runs once the recent mean squared distance of the new
+# ballots to their centroid grew by this fraction over the one of the last fit
+DRIFT_THRESHOLD = 0.5
+# the number of recent ballots the drift is averaged over
+DRIFT_WINDOW = 500
+# the first fit waits for this many ballots per cluster (and for a whole
+# drift window), so its centroids and baseline are not those of k ballots
+WARMUP_PER_CLUSTER = 10
+
+# cluster the ballots of a live round as they arrive: each new ballot goes
+# to its closest centroid (O(k * projects)) which then moves towards it
+# (MacQueen's sequential update), and the whole round is only reclustered
+# when the new ballots drift away from the centroids
+# @note like the TS KMeans, the ballots are clustered on sqrt(weight); the
+# per-cluster sums of sqrt(weight) are kept up to date, so the sizes,
+# coefficients and QF can be read at any time without a refit
+class OnlineKMeans:
+    def __init__(self, k, projects, threshold=DRIFT_THRESHOLD, window=DRIFT_WINDOW, random_state=0):
+        self.k = k
+        self.projects = projects
+        self.threshold = threshold
+        self.window = window
+        self.random_state = random_state
+
+        self.centroids = None
+        self.sizes = np.zeros(k, dtype=np.int64)
+        # the sum of sqrt(weight) per cluster and project, and per project
+        self.root_sums = np.zeros((k, projects))
+        self.column_sums = np.zeros(projects)
+        self.assignments = []
+        self.reclusters = 0
+
+        # every ballot so far (sqrt weights), for the full reclusters
+        self._indices = []
+        self._roots = []
+        self._baseline = None
+        self._recent = None
+
+    @property
+    def voters(self):
+        return len(self.assignments)
+
+    # the sqrt weights of a ballot, given as a dense vector of weights or
+    # as {project index: weight}
+    def _roots_of(self, ballot):
+        if isinstance(ballot, dict):
+            roots = np.zeros(self.projects)
+            for project, weight in ballot.items():
+                roots[project] += weight
+            return np.sqrt(roots)
+        return np.sqrt(np.asarray(ballot, dtype=np.float64).ravel())
+
+    # every ballot so far as a voters x projects CSR matrix of sqrt weights
+    def ballots(self):
+        indptr = np.zeros(self.voters + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in self._indices], out=indptr[1:])
+        indices = np.concatenate(self._indices) if self._indices else np.zeros(0, dtype=np.int64)
+        roots = np.concatenate(self._roots) if self._roots else np.zeros(0)
+        return csr_matrix((roots, indices, indptr), shape=(self.voters, self.projects))
+
+    # add a ballot, reclustering the round when it drifted
+    # @return the cluster of the ballot (before a possible recluster)
+    def add(self, ballot):
+        roots = self._roots_of(ballot)
+        nonzero = np.flatnonzero(roots)
+        self._indices.append(nonzero)
+        self._roots.append(roots[nonzero])
+        self.column_sums += roots
+
+        if self.centroids is None:
+            # warming up: the ballots are spread over the clusters until
+            # there are enough of them for the first fit
+            cluster = self.voters % self.k
+            self.assignments.append(cluster)
+            self.sizes[cluster] += 1
+            self.root_sums[cluster] += roots
+            if self.voters >= self.warmup():
+                self.recluster()
+            return cluster
+
+        distances = np.square(self.centroids - roots).sum(axis=1)
+        cluster = int(np.argmin(distances))
+        self.assignments.append(cluster)
+        self.sizes[cluster] += 1
+        self.root_sums[cluster] += roots
+        # MacQueen: the centroid is the running mean of its ballots
+        self.centroids[cluster] += (roots - self.centroids[cluster]) / self.sizes[cluster]
+
+        # exponentially weighted mean squared distance of the recent ballots
+        self._recent += (distances[cluster] - self._recent) / self.window
+        if self.drift() > self.threshold:
+            self.recluster()
+        return cluster
+
+    # the number of ballots the first fit waits for
+    def warmup(self):
+        return max(self.window, WARMUP_PER_CLUSTER * self.k)
+
+    # how much worse the recent ballots fit their centroids than the
+    # ballots of the last full fit did (0 right after a fit)
+    # @note after a perfect fit (e.g. only duplicate ballots) any new error
+    # is infinite drift, so the next ballot that does not fit reclusters
+    def drift(self):
+        if self._baseline is None:
+            return 0.0
+        if self._baseline == 0:
+            return np.inf if self._recent > 0 else 0.0
+        return self._recent / self._baseline - 1
+
+    # refit KMeans on every ballot so far, starting from the current
+    # centroids, and reset the drift
+    def recluster(self):
+        data = self.ballots()
+        if self.centroids is None:
+            model = KMeans(n_clusters=self.k, init='k-means++', n_init=1, random_state=self.random_state)
+        else:
+            model = KMeans(n_clusters=self.k, init=self.centroids, n_init=1)
+        labels = model.fit_predict(data)
+
+        self.centroids = model.cluster_centers_.copy()
+        self.assignments = [int(x) for x in labels]
+        self.sizes = np.bincount(labels, minlength=self.k)
+        self.root_sums = cluster_root_sums(data, labels[None, :], self.k)[0]
+        self._baseline = model.inertia_ / self.voters
+        self._recent = self._baseline
+        self.reclusters += 1
+
+    # the coefficient of every cluster, like allocations.cluster_coefficients
+    def coefficients(self, one_minus=True):
+        return cluster_coefficients(self.sizes[None, :].astype(np.float64), self.voters, one_minus)[0]
+
+    # traditional QF and the provisional QF, penalties and coefficients of
+    # all four variants, from the running sums in O(k * projects)
+    # @return the same fields as allocations.allocate
+    def allocation(self):
+        trad_qfs = np.square(self.column_sums)
+        output = {'tradQFs': trad_qfs, 'clustersSizes': self.sizes.copy()}
+        for one_minus in (True, False):
+            coefficients = self.coefficients(one_minus)
+            prefix = 'one_minus_' if one_minus else ''
+            variants = {
+                'square_before': np.square(coefficients @ self.root_sums),
+                'square_after': np.square(np.sqrt(coefficients) @ self.root_sums)
+            }
+            for name, qfs in variants.items():
+                output[prefix + name] = {'coefficients': coefficients, 'qfs': qfs, 'penalties': trad_qfs - qfs}
+
+        return output
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay a round ballot by ballot through the online KMeans')
+    parser.add_argument('round', help='a mainnet_votes_parsed_*.json file or its converted round store')
+    parser.add_argument('k', type=int)
+    parser.add_argument('--threshold', type=float, default=DRIFT_THRESHOLD, help='the drift which triggers a full recluster')
+    parser.add_argument('--window', type=int, default=DRIFT_WINDOW, help='the number of recent ballots the drift is averaged over')
+    args = parser.parse_args()
+
+    data = load_round_matrix(args.round).tocsr()
+    stream = OnlineKMeans(args.k, data.shape[1], args.threshold, args.window)
+    start = time.perf_counter()
+    for row in range(data.shape[0]):
+        ballot = data[row]
+        stream.add(dict(zip(ballot.indices, ballot.data)))
+        if stream.voters % 1000 == 0:
+            print(f'{stream.voters} ballots, sizes {stream.sizes.tolist()}, drift {stream.drift():.2f}, {stream.reclusters} reclusters')
+    elapsed = time.perf_counter() - start
+    print(f'{stream.voters} ballots in {elapsed:.2f}s ({stream.voters / elapsed:.0f}/s), {stream.reclusters} reclusters')
+
+    # the running QF matches a batch allocation of the same assignments
+    batch = allocate(data, stream.assignments, args.k)
+    live = stream.allocation()
+    for variant in ('one_minus_square_before', 'square_after'):
+        print(f"{variant}: max difference to the batch QF {np.max(np.abs(live[variant]['qfs'] - batch[variant]['qfs'])):.3g}")
@@ -0,0 +1,304 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from scipy.sparse import issparse
+from scipy.cluster.hierarchy import linkage
+from sklearn.cluster import KMeans, AgglomerativeClustering, SpectralClustering, DBSCAN, k_means
+# @note private, but the cut AgglomerativeClustering itself makes: undo the
+# last n-1 merges, so there are always exactly n clusters
+from sklearn.cluster._agglomerative import _hc_cut
+from sklearn.manifold import spectral_embedding
+from sklearn.neighbors import kneighbors_graph
+from sklearn.mixture import GaussianMixture
+from hdbscan import HDBSCAN
+from threadpoolctl import threadpool_limits
+
+import model_cache
+from tracing import span, traced
+from dedupe import unique_ballots, expand_labels
+from density import dbscan_sweep, hdbscan_sweep
+
+# the algorithms fitted for every n in the elbow range
+ELBOW_ALGORITHMS = ['kmeans', 'agglomerative', 'spectral', 'gmm']
+
+# the algorithms which can fit a sparse matrix without densifying it
+# @note not HDBSCAN: on sparse input it builds the voters x voters distance
+# matrix, so it gets the dense rows like the others (see density.py)
+SPARSE_ALGORITHMS = {'kmeans', 'spectral', 'dbscan'}
+
+# the algorithms taking a sample_weight, which can fit the unique ballots
+# only, weighted by how many voters cast each one
+# @note GaussianMixture, HDBSCAN, Spectral and Agglomerative have no
+# sample_weight, so they always fit every ballot
+WEIGHTED_ALGORITHMS = {'kmeans', 'dbscan'}
+
+# the datasets shared with every worker process (set by init_worker)
+_datasets = None
+
+# build the full list of (algorithm, hyperparameter) fits
+def build_tasks(max_clusters=20):
+    tasks = []
+    for n in range(3, max_clusters+1):
+        for algorithm in ELBOW_ALGORITHMS:
+            tasks.append((algorithm, n))
+
+    for eps_value in np.linspace(0.1, 1.0, 10):
+        tasks.append(('dbscan', round(float(eps_value), 2)))
+
+    for min_cluster_size in range(2, 12):
+        tasks.append(('hdbscan', min_cluster_size))
+
+    return tasks
+
+# count the points per cluster (noise, labelled -1, is counted separately)
+def cluster_sizes(labels):
+    labels = np.asarray(labels)
+    clusters = labels[labels >= 0]
+    sizes = np.bincount(clusters) if clusters.size else np.zeros(0, dtype=int)
+    return [int(x) for x in sizes], int(np.sum(labels < 0))
+
+# store the data once per worker so it is not pickled with every task
+def init_worker(datasets):
+    global _datasets
+    _datasets = datasets
+    # every process fits a single model, so keep the BLAS/OpenMP pools
+    # from oversubscribing the cores
+    threadpool_limits(1)
+
+# the dataset an algorithm runs on: density based algorithms use the raw
+# weights, the others the standardized ones
+def dataset_of(algorithm):
+    return 'raw' if algorithm in ('dbscan', 'hdbscan') else 'standardized'
+
+# every hyperparameter of a task, passed to the estimator and hashed into
+# its cache key
+def task_params(task):
+    algorithm, param = task
+    if algorithm == 'kmeans':
+        return {'n_clusters': param, 'init': 'k-means++'}
+    if algorithm == 'agglomerative':
+        return {'n_clusters': param}
+    if algorithm == 'spectral':
+        # a sparse k-NN affinity instead of the dense RBF one, which needs
+        # voters^2 memory
+        return {'n_clusters': param, 'affinity': 'nearest_neighbors', 'n_neighbors': 10}
+    if algorithm == 'gmm':
+        return {'n_components': param}
+    if algorithm == 'dbscan':
+        return {'eps': param, 'min_samples': 5}
+    if algorithm == 'hdbscan':
+        return {'min_samples': 5, 'min_cluster_size': param}
+    raise ValueError(f'Unknown algorithm {algorithm}')
+
+# fit a single (algorithm, hyperparameter) task
+def fit_task(task):
+    algorithm, param = task
+    data = _datasets[dataset_of(algorithm)]
+    params = task_params(task)
+    fit_params = {}
+    deduped = algorithm in WEIGHTED_ALGORITHMS and 'counts' in _datasets
+    if deduped:
+        data = _datasets[dataset_of(algorithm) + '_unique']
+        fit_params['sample_weight'] = _datasets['counts']
+
+    # ward linkage and GMM only work on dense input
+    if issparse(data) and algorithm not in SPARSE_ALGORITHMS:
+        data = data.toarray()
+
+    result = {'algorithm': algorithm, 'param': param}
+    if algorithm == 'kmeans':
+        model = KMeans(**params)
+        labels = model.fit_predict(data, **fit_params)
+        result['inertia'] = float(model.inertia_)
+    elif algorithm == 'agglomerative':
+        labels = AgglomerativeClustering(**params).fit_predict(data)
+    elif algorithm == 'spectral':
+        labels = SpectralClustering(**params).fit_predict(data)
+    elif algorithm == 'gmm':
+        model = GaussianMixture(**params)
+        labels = model.fit_predict(data)
+        result['bic'] = float(model.bic(data))
+        result['aic'] = float(model.aic(data))
+    elif algorithm == 'dbscan':
+        labels = DBSCAN(**params).fit_predict(data, **fit_params)
+    else:
+        labels = HDBSCAN(**params).fit_predict(data)
+
+    if deduped:
+        # back to one label per voter
+        labels = expand_labels(labels, _datasets['inverse'])
+    result['labels'] = [int(x) for x in labels]
+    result['sizes'], result['noise'] = cluster_sizes(labels)
+
+    return result
+
+# fit the ward linkage tree once and cut it for every n
+# @note the same tree AgglomerativeClustering(n_clusters=n) builds, so the
+# cuts share the cache keys of the per-n fits
+def fit_tree(ns):
+    data = _datasets['standardized']
+    if issparse(data):
+        data = data.toarray()
+
+    tree = linkage(data, method='ward')
+    # scipy numbers the merges like sklearn's children_ (merge i is node
+    # voters + i); fcluster's maxclust cut can give fewer than n clusters
+    # when merge heights tie, e.g. on duplicate ballots
+    children = tree[:, :2].astype(np.intp)
+    results = []
+    for n in ns:
+        labels = _hc_cut(n, children, data.shape[0])
+        result = {'algorithm': 'agglomerative', 'param': n}
+        result['labels'] = [int(x) for x in labels]
+        result['sizes'], result['noise'] = cluster_sizes(labels)
+        results.append(result)
+
+    return results
+
+# build the k-NN affinity graph and its spectral embedding once, for the
+# largest n, then only run KMeans in the embedding for every n
+# @note the leading eigenvectors do not depend on how many are computed,
+# so this matches SpectralClustering(n_clusters=n) with the same affinity
+def fit_spectral(ns):
+    data = _datasets['standardized']
+    params = task_params(('spectral', max(ns)))
+    connectivity = kneighbors_graph(data, n_neighbors=params['n_neighbors'], include_self=True)
+    affinity = 0.5 * (connectivity + connectivity.T)
+    maps = spectral_embedding(affinity, n_components=max(ns), drop_first=False)
+
+    results = []
+    for n in ns:
+        _, labels, _ = k_means(maps[:, :n], n, n_init=10)
+        result = {'algorithm': 'spectral', 'param': n}
+        result['labels'] = [int(x) for x in labels]
+        result['sizes'], result['noise'] = cluster_sizes(labels)
+        results.append(result)
+
+    return results
+
+# the labels of a density based algorithm back as sweep results
+def density_results(algorithm, labels):
+    results = []
+    for param, setting_labels in labels.items():
+        if algorithm in WEIGHTED_ALGORITHMS and 'counts' in _datasets:
+            setting_labels = expand_labels(setting_labels, _datasets['inverse'])
+        result = {'algorithm': algorithm, 'param': param}
+        result['labels'] = [int(x) for x in setting_labels]
+        result['sizes'], result['noise'] = cluster_sizes(setting_labels)
+        results.append(result)
+
+    return results
+
+# every DBSCAN eps from one radius neighbor graph (see density.py)
+def fit_dbscan(eps_values):
+    if 'counts' in _datasets:
+        labels = dbscan_sweep(_datasets['raw_unique'], eps_values, sample_weight=_datasets['counts'])
+    else:
+        labels = dbscan_sweep(_datasets['raw'], eps_values)
+    return density_results('dbscan', labels)
+
+# every HDBSCAN min_cluster_size from one tree (see density.py)
+def fit_hdbscan(min_cluster_sizes):
+    return density_results('hdbscan', hdbscan_sweep(_datasets['raw'], min_cluster_sizes))
+
+# the algorithms whose tasks share most of the work across their
+# parameter, fitted as one job
+GROUPED_ALGORITHMS = {
+    'agglomerative': fit_tree,
+    'spectral': fit_spectral,
+    'dbscan': fit_dbscan,
+    'hdbscan': fit_hdbscan
+}
+
+# fit a job: the tasks of a grouped algorithm are fitted together, every
+# other task is fitted on its own
+def fit_job(job):
+    algorithm = job[0][0]
+    with span(f'fit {algorithm}', params=[param for _, param in job]):
+        if algorithm in GROUPED_ALGORITHMS:
+            return GROUPED_ALGORITHMS[algorithm]([param for _, param in job])
+        return [fit_task(task) for task in job]
+
+# the cache key of every task: the raw matrix, the scaler applied to the
+# dataset the algorithm runs on (and whether it was deduplicated) and
+# every hyperparameter
+def task_keys(datasets, tasks, scaler, dedupe=False):
+    digest = model_cache.matrix_digest(datasets['raw'])
+    keys = {}
+    for task in tasks:
+        preprocessing = scaler if dataset_of(task[0]) == 'standardized' else 'none'
+        if dedupe and task[0] in WEIGHTED_ALGORITHMS:
+            preprocessing += '+dedupe'
+        keys[task] = model_cache.fit_key(digest, preprocessing, task[0], task_params(task))
+
+    return keys
+
+# the result of a task whose fit raised, which is not cached
+def failed_result(task, error):
+    return {'algorithm': task[0], 'param': task[1], 'error': f'{type(error).__name__}: {error}'}
+
+# whether a task was fitted, rather than failed
+def succeeded(result):
+    return result is not None and 'error' not in result
+
+# run every task on a process pool, skipping the ones already in the cache
+# @param scaler the preprocessing applied to datasets['standardized']
+# @param cache_size the size limit of the cache in bytes, the least
+# recently used fits are evicted past it
+# @param dedupe fit the weighted algorithms on the unique ballots only
+# @return {task: result}, the result of a failed task holds its 'error'
+@traced
+def run_sweep(datasets, tasks, cache_dir, workers=None, scaler='standard', cache_size=512 * 2**20, dedupe=False):
+    keys = task_keys(datasets, tasks, scaler, dedupe)
+    results = {}
+    for task in tasks:
+        result = model_cache.get(cache_dir, keys[task])
+        if result is not None:
+            results[task] = result
+    pending = [task for task in tasks if task not in results]
+
+    print(f'{len(results)} tasks restored from {cache_dir}, {len(pending)} to run')
+    if pending and dedupe:
+        index, counts, inverse = unique_ballots(datasets['raw'])
+        print(f'{len(index)} unique ballots out of {len(inverse)}')
+        # scaling maps identical rows to identical rows, so the unique scaled
+        # ballots are the scaled rows of the unique raw ones
+        datasets = dict(
+            datasets,
+            raw_unique=datasets['raw'][index],
+            standardized_unique=datasets['standardized'][index],
+            counts=counts,
+            inverse=inverse
+        )
+    if pending:
+        # the grouped jobs are the longest, so they go first
+        jobs = []
+        for algorithm in GROUPED_ALGORITHMS:
+            group = [task for task in pending if task[0] == algorithm]
+            if group:
+                jobs.append(group)
+        jobs += [[task] for task in pending if task[0] not in GROUPED_ALGORITHMS]
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(datasets,)) as pool:
+            futures = {pool.submit(fit_job, job): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    fitted = future.result()
+                except Exception as error:
+                    # a failed fit only fails its own job, the sweep goes on
+                    for task in job:
+                        results[task] = failed_result(task, error)
+                        print(f'failed {task[0]} ({task[1]}): {results[task]["error"]} - {len(results)}/{len(tasks)}')
+                    continue
+                for task, result in zip(job, fitted):
+                    # cache each fit as it finishes so an interrupted sweep resumes
+                    model_cache.put(cache_dir, keys[task], result)
+                    results[task] = result
+                    print(f'finished {task[0]} ({task[1]}) - {len(results)}/{len(tasks)}')
+
+    evicted, total = model_cache.evict(cache_dir, cache_size)
+    if evicted:
+        print(f'evicted {evicted} cached fits, {total / 2**20:.1f}MB left')
+
+    return results
@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ballots import save_round
+
+WEIGHT_DISTRIBUTIONS = ['lognormal', 'pareto', 'uniform']
+
+# draw n vote weights, all positive
+def draw_weights(rng, n, distribution='lognormal'):
+    if distribution == 'lognormal':
+        # most contributions are a few units, with a long tail
+        return rng.lognormal(mean=1.0, sigma=1.0, size=n)
+    if distribution == 'pareto':
+        return 1 + rng.pareto(1.5, size=n)
+    if distribution == 'uniform':
+        return rng.uniform(0.1, 10, size=n)
+    raise ValueError(f'Unknown weight distribution {distribution}')
+
+# a synthetic QF round as a voters x projects CSR matrix
+# @param density the mean fraction of the projects a ballot votes for (every
+# ballot votes for at least one)
+# @param popularity the Zipf exponent of the project popularity, 0 makes every
+# project as likely
+# @param blocks the number of injected collusion blocks: groups of
+# block_size voters casting the same ballot over block_projects projects
+# @return (matrix, groups), groups holds the collusion block of every voter
+# or -1 for an independent one
+def generate_round(voters, projects, density=0.05, weights='lognormal', popularity=1.0, blocks=0, block_size=50, block_projects=3, random_state=None):
+    rng = np.random.default_rng(random_state)
+
+    votes = 1 + rng.poisson(max(density * projects - 1, 0), size=voters)
+    votes = np.minimum(votes, projects)
+    indptr = np.zeros(voters + 1, dtype=np.int64)
+    np.cumsum(votes, out=indptr[1:])
+
+    # the projects are drawn with replacement, a project drawn twice by the
+    # same voter is a single (summed) vote like in ballots_to_csr
+    ranks = np.arange(1, projects + 1, dtype=np.float64)
+    probabilities = ranks ** -popularity
+    probabilities /= probabilities.sum()
+    indices = rng.permutation(projects)[rng.choice(projects, size=indptr[-1], p=probabilities)]
+    data = draw_weights(rng, indptr[-1], weights)
+    matrix = csr_matrix((data, indices, indptr), shape=(voters, projects))
+    matrix.sum_duplicates()
+
+    groups = np.full(voters, -1)
+    if blocks:
+        if blocks * block_size > voters:
+            raise ValueError('The collusion blocks cannot hold more voters than the round')
+        members = rng.permutation(voters)[:blocks * block_size].reshape(blocks, block_size)
+        rows = np.repeat(np.arange(voters), np.diff(matrix.indptr))
+        for block, block_voters in enumerate(members):
+            groups[block_voters] = block
+        # the block voters drop their own ballot for the one of their block
+        keep = groups[rows] < 0
+        coo_rows, coo_cols, coo_data = [rows[keep]], [matrix.indices[keep]], [matrix.data[keep]]
+        for block_voters in members:
+            targets = rng.choice(projects, size=min(block_projects, projects), replace=False)
+            ballot = draw_weights(rng, len(targets), weights)
+            coo_rows.append(np.repeat(block_voters, len(targets)))
+            coo_cols.append(np.tile(targets, block_size))
+            coo_data.append(np.tile(ballot, block_size))
+        matrix = csr_matrix(
+            (np.concatenate(coo_data), (np.concatenate(coo_rows), np.concatenate(coo_cols))),
+            shape=(voters, projects)
+        )
+        matrix.sort_indices()
+
+    return matrix, groups
+
+# write the matrix as a mainnet_votes_parsed_*.json list of ballots
+def write_parsed(matrix, path):
+    ballots = []
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row+1]
+        ballots.append({
+            str(project + 1): {'voteOption': str(project + 1), 'voteWeight': str(float(weight))}
+            for project, weight in zip(matrix.indices[start:end], matrix.data[start:end])
+        })
+    with open(path, 'w') as outfile:
+        json.dump(ballots, outfile)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a synthetic QF round')
+    parser.add_argument('voters', type=int)
+    parser.add_argument('projects', type=int)
+    parser.add_argument('output', help='a round store directory, or a .json file for the parsed ballot format')
+    parser.add_argument('--density', type=float, default=0.05, help='mean fraction of the projects a ballot votes for')
+    parser.add_argument('--weights', choices=WEIGHT_DISTRIBUTIONS, default='lognormal', help='the distribution of the vote weights')
+    parser.add_argument('--popularity', type=float, default=1.0, help='Zipf exponent of the project popularity')
+    parser.add_argument('--blocks', type=int, default=0, help='number of injected collusion blocks')
+    parser.add_argument('--block-size', type=int, default=50, help='voters per collusion block')
+    parser.add_argument('--block-projects', type=int, default=3, help='projects voted by every collusion block')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    matrix, groups = generate_round(
+        args.voters, args.projects, args.density, args.weights, args.popularity,
+        args.blocks, args.block_size, args.block_projects, args.seed
+    )
+    if args.output.endswith('.json'):
+        write_parsed(matrix, args.output)
+        groups_path = os.path.splitext(args.output)[0] + '_groups.json'
+    else:
+        save_round(matrix, args.output, f'synthetic seed {args.seed}')
+        groups_path = os.path.join(args.output, 'groups.json')
+
+    # the injected collusion block of every voter, the ground truth for the clusterings
+    with open(groups_path, 'w') as outfile:
+        json.dump({'groups': [int(x) for x in groups]}, outfile)
+    print(f'{matrix.shape[0]} voters x {matrix.shape[1]} projects, {matrix.nnz} votes -> {args.output}')
@@ -0,0 +1,139 @@
+import atexit
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import nullcontext
+
+# QF_TRACE=<path> turns the spans on: every finished span is appended to the
+# file as a Chrome trace event (JSON array format, open it in
+# chrome://tracing or ui.perfetto.dev), from every process of the run
+TRACE = os.environ.get('QF_TRACE')
+# QF_TRACE_MEMORY=1 also records the peak of the allocations of every span
+# (tracemalloc slows pure Python code down noticeably)
+MEMORY = TRACE is not None and os.environ.get('QF_TRACE_MEMORY') == '1'
+if MEMORY:
+    tracemalloc.start()
+
+# the no-op span returned while tracing is off
+_disabled = nullcontext()
+# the tracemalloc peaks of the open spans of this process, innermost last
+_peaks = []
+_lock = threading.Lock()
+_trace = None
+
+# the trace file of this process, opened with its first span
+def _trace_file():
+    global _trace
+    if _trace is None:
+        _trace = open(TRACE, 'a', buffering=1)
+        atexit.register(_trace.close)
+    return _trace
+
+# the first process of the run starts the trace file; the processes it
+# starts (e.g. the sweep workers) inherit QF_TRACE_OWNER and append to it
+if TRACE is not None and os.environ.get('QF_TRACE_OWNER') is None:
+    os.environ['QF_TRACE_OWNER'] = str(os.getpid())
+    with open(TRACE, 'w') as outfile:
+        # the closing bracket is optional in the JSON array format
+        outfile.write('[\n')
+
+class _Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        if MEMORY:
+            # the peak of the enclosing span so far, before the reset
+            if _peaks:
+                _peaks[-1] = max(_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            _peaks.append(0)
+            self.base = tracemalloc.get_traced_memory()[0]
+        self.cpu = time.process_time()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        args = dict(self.args)
+        args['cpu_ms'] = (time.process_time() - self.cpu) * 1000
+        # ru_maxrss is in KB on Linux (bytes on macOS)
+        args['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+        if MEMORY:
+            peak = max(_peaks.pop(), tracemalloc.get_traced_memory()[1])
+            # allocated on top of what was live when the span started
+            args['peak_mb'] = (peak - self.base) / 2**20
+            # the enclosing span peaked at least as high
+            if _peaks:
+                _peaks[-1] = max(_peaks[-1], peak)
+
+        event = {
+            'name': self.name,
+            'ph': 'X',
+            'ts': self.start / 1000,
+            'dur': (end - self.start) / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args
+        }
+        with _lock:
+            _trace_file().write(json.dumps(event) + ',\n')
+        return False
+
+# a span around a stage: with tracing on, its wall time, CPU time, peak RSS
+# (and peak allocations with QF_TRACE_MEMORY=1) are written to the trace
+# @param args extra fields recorded with the span, e.g. the algorithm
+def span(name, **args):
+    if TRACE is None:
+        return _disabled
+    return _Span(name, args)
+
+# decorate a function with a span named after it; with tracing off the
+# function is returned as is
+def traced(fn=None, name=None):
+    if fn is None:
+        return lambda fn: traced(fn, name)
+    if TRACE is None:
+        return fn
+
+    span_name = name or fn.__qualname__
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _Span(span_name, {}):
+            return fn(*args, **kwargs)
+    return wrapper
+
+# the events of a trace file
+def read_trace(path):
+    with open(path) as infile:
+        text = infile.read().strip().rstrip(',')
+    if not text.endswith(']'):
+        text += ']'
+    return json.loads(text)
+
+# the wall and CPU time of every span name, summed over the trace
+def summarize(events):
+    totals = defaultdict(lambda: {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'max_rss_mb': 0.0})
+    for event in events:
+        total = totals[event['name']]
+        total['count'] += 1
+        total['wall_s'] += event['dur'] / 1e6
+        total['cpu_s'] += event['args']['cpu_ms'] / 1000
+        total['max_rss_mb'] = max(total['max_rss_mb'], event['args']['max_rss_mb'])
+
+    return dict(totals)
+
+if __name__ == "__main__":
+    # python3 src/plotting/tracing.py <trace>, e.g. after
+    # QF_TRACE=trace.json python3 src/plotting/clustering.py
+    totals = summarize(read_trace(sys.argv[1]))
+    print(f'{"span":<32} {"count":>6} {"wall s":>9} {"cpu s":>9} {"max rss MB":>11}')
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]['wall_s']):
+        print(f"{name:<32} {total['count']:>6} {total['wall_s']:>9.3f} {total['cpu_s']:>9.3f} {total['max_rss_mb']:>11.1f}")
@@ -1,7 +1,9 @@
-import matplotlib.pyplot as plt
 import json 
 import sys 
 
+import plotting_path  # puts src/plotting on the import path
+import render
+
 # read data
 def read_data(): 
     k = sys.argv[1]
@@ -30,20 +32,21 @@ def parse_data():
 
 # plot the data
 def plot_by_size_of_clusters(k, sizes, cosine):
-    plt.bar(list(range(1, k+1)), sizes , color='g')
+    fig, ax = render.axes('sizes')
+    ax.bar(list(range(1, k+1)), sizes , color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Size of cluster for k = {k}'.format(k))
-    plt.xlabel('Clusters')
-    plt.xticks(list(range(1, k+1)))
-    plt.ylabel('Number of Ballots')
+    ax.set_title(f'Size of cluster for k = {k}')
+    ax.set_xlabel('Clusters')
+    ax.set_xticks(list(range(1, k+1)))
+    ax.set_ylabel('Number of Ballots')
 
     # save
     if cosine == True:
         output = "cosine"
     else: output = "eucledian"
-    plt.savefig(
-        f'./src/prod/gitcoin/{output}/plots/{sys.argv[2]}_k_{k}_sizes.png', dpi=300
+    render.save(fig,
+        f'./src/prod/gitcoin/{output}/plots/{sys.argv[2]}_k_{k}_sizes.png'
     )
 
 if __name__ == "__main__":
@@ -1,7 +1,9 @@
-import matplotlib.pyplot as plt
 import json 
 import sys 
 
+import plotting_path  # puts src/plotting on the import path
+import render
+
 filename = sys.argv[1]
 output = sys.argv[2]
 iteration = sys.argv[3]
@@ -20,8 +22,11 @@ def parse_data():
     db_scores = data['dbIndexes']
     wcss = data['elbows']
     dunn_scores = data['dunnScores']
+    # the score files of an adaptive sweep list the ks they reached
+    ks = data.get('ks', list(range(3, 21)))
 
     return (
+        ks,
         sil_scores,
         db_scores,
         wcss,
@@ -30,83 +35,73 @@ def parse_data():
 
 
 # plot the data
-def plot_by_dbScore(db_scores):
-    plt.bar(list(range(3, 21)), db_scores, color='g')
+def plot_by_dbScore(db_scores, ks):
+    fig, ax = render.axes('db_scores')
+    ax.bar(ks, db_scores, color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Davies Boul scores {iteration}')
-    plt.xlabel('Clusters')
-    plt.xticks(list(range(3, 21)))
-    plt.ylabel('Score')
+    ax.set_title(f'Davies Boul scores {iteration}')
+    ax.set_xlabel('Clusters')
+    ax.set_xticks(ks)
+    ax.set_ylabel('Score')
 
     # save
-    plt.savefig(
+    render.save(fig,
         f'./src/prod/gitcoin/{output}/plots/scores/daviesb_plot_{iteration}.png'
-        , dpi=300
     )
 
-    plt.clf()
-
 # plot the data
-def plot_by_silhoutteScore(scores):
-    plt.bar(list(range(3, 21)), scores, color='g')
+def plot_by_silhoutteScore(scores, ks):
+    fig, ax = render.axes('silhoutte')
+    ax.bar(ks, scores, color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Silhoutte {iteration}')
-    plt.xlabel('Clusters')
-    plt.xticks(list(range(3, 21)))
-    plt.ylabel('Score')
+    ax.set_title(f'Silhoutte {iteration}')
+    ax.set_xlabel('Clusters')
+    ax.set_xticks(ks)
+    ax.set_ylabel('Score')
 
     # save
-    plt.savefig(
+    render.save(fig,
         f'./src/prod/gitcoin/{output}/plots/scores/silhoutte_plot_{iteration}.png'
-        , dpi=300
     )
 
-    plt.clf()
-
 
-def plot_wcss(wcss):
-    plt.plot(list(range(3, 21)), wcss, color='g')
+def plot_wcss(wcss, ks):
+    fig, ax = render.axes('wcss')
+    ax.plot(ks, wcss, color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'WCSS Elbow Method {iteration}')
-    plt.xlabel('k')
-    plt.xticks(list(range(3, 21)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=6)
-    plt.ylabel('WCSS score')
+    ax.set_title(f'WCSS Elbow Method {iteration}')
+    ax.set_xlabel('k')
+    ax.set_xticks(ks)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=6)
+    ax.set_ylabel('WCSS score')
 
     # save
-    plt.savefig(
+    render.save(fig,
         f'./src/prod/gitcoin/{output}/plots/scores/elbow_plot_{iteration}.png'
-        , dpi=300
     )
 
-    plt.clf()
-
-def plot_dunn(dunn):
-    plt.bar(list(range(3, 21)), dunn, color='g')
+def plot_dunn(dunn, ks):
+    fig, ax = render.axes('dunn')
+    ax.bar(ks, dunn, color='g')
 
     # Add a title and labels to the axes
-    plt.title(f'Dunn scores {iteration}')
-    plt.xlabel('k')
-    plt.xticks(list(range(3, 21)))
-    plt.xticks(rotation=90)
-    plt.tick_params(axis='x', labelsize=6)
-    plt.ylabel('Dunn score')
+    ax.set_title(f'Dunn scores {iteration}')
+    ax.set_xlabel('k')
+    ax.set_xticks(ks)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=6)
+    ax.set_ylabel('Dunn score')
 
     # save
-    plt.savefig(
+    render.save(fig,
         f'./src/prod/gitcoin/{output}/plots/scores/dunn_plot_{iteration}.png'
-        , dpi=300
     )
 
-    plt.clf()
-
 if __name__ == "__main__":
-    sil_scores, db_scores, wcss, dunn_scores  = parse_data()
-    plot_by_silhoutteScore(sil_scores)
-    plot_by_dbScore(db_scores)
-    plot_wcss(wcss)
-    plot_dunn(dunn_scores)
+    ks, sil_scores, db_scores, wcss, dunn_scores  = parse_data()
+    plot_by_silhoutteScore(sil_scores, ks)
+    plot_by_dbScore(db_scores, ks)
+    plot_wcss(wcss, ks)
+    plot_dunn(dunn_scores, ks)
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# the plot scripts of src/prod draw with the shared helpers of src/plotting;
+# importing this module (it sits next to them, so it is always importable)
+# puts that directory on the import path, whether a script runs on its own
+# or through batch_render
+PLOTTING_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plotting'))
+
+if PLOTTING_DIR not in sys.path:
+    sys.path.append(PLOTTING_DIR)
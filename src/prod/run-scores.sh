@@ -6,6 +6,8 @@ contract_4="data_0xe575282b376e3c9886779a841a2510f1dd8c2ce4"
 eucledian="eucledian"
 cosine="cosine"
 
+manifest=$(mktemp)
+
 for i in {1..2}
 do  
     echo "Running k-means scores iteration = $i"
@@ -19,10 +21,14 @@ do
     # python3 src/prod/plot_scores.py "$eucledian/scores/$contract_2" $eucledian $i
     # python3 src/prod/plot_scores.py "$eucledian/scores/$contract_2" $eucledian $i
     # python3 src/prod/plot_scores.py "$eucledian/scores/$contract_2" $eucledian $i
-    python3 src/prod/plot_scores.py "$cosine/scores/$contract_1" $cosine $i
-    python3 src/prod/plot_scores.py "$cosine/scores/$contract_2" $cosine $i
-    python3 src/prod/plot_scores.py "$cosine/scores/$contract_2" $cosine $i
-    python3 src/prod/plot_scores.py "$cosine/scores/$contract_2" $cosine $i
+    echo "{\"script\": \"src/prod/plot_scores.py\", \"args\": [\"$cosine/scores/$contract_1\", \"$cosine\", $i]}" >> "$manifest"
+    echo "{\"script\": \"src/prod/plot_scores.py\", \"args\": [\"$cosine/scores/$contract_2\", \"$cosine\", $i]}" >> "$manifest"
+    echo "{\"script\": \"src/prod/plot_scores.py\", \"args\": [\"$cosine/scores/$contract_2\", \"$cosine\", $i]}" >> "$manifest"
+    echo "{\"script\": \"src/prod/plot_scores.py\", \"args\": [\"$cosine/scores/$contract_2\", \"$cosine\", $i]}" >> "$manifest"
 
     echo "Finished plotting iteration = $i"
-done 
\ No newline at end of file
+done
+
+# render every plot in a single python process
+python3 src/plotting/batch_render.py "$manifest" --workers 4
+rm "$manifest"
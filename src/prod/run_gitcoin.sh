@@ -4,13 +4,18 @@ contract_2="0xd95a1969c41112cee9a2c931e849bcef36a16f4c"
 contract_3="0xdf75054cd67217aee44b4f9e4ebc651c00330938"
 contract_4="0xe575282b376e3c9886779a841a2510f1dd8c2ce4"
 
+manifest=$(mktemp)
 for i in {3..20}
 do  
     # run the k-means algo 
     npx ts-node --esm src/prod/run-kmeans_gitcoin_data.ts $i
-    # plot the number of ballots x cluster
-    python3 src/prod/plot_cluster_size.py $i $contract_1
-    python3 src/prod/plot_cluster_size.py $i $contract_2
-    python3 src/prod/plot_cluster_size.py $i $contract_3
-    python3 src/prod/plot_cluster_size.py $i $contract_4
-done 
\ No newline at end of file
+    # queue the plots of the number of ballots x cluster
+    for contract in $contract_1 $contract_2 $contract_3 $contract_4
+    do
+        echo "{\"script\": \"src/prod/plot_cluster_size.py\", \"args\": [$i, \"$contract\"]}" >> "$manifest"
+    done
+done
+
+# render every plot in a single python process
+python3 src/plotting/batch_render.py "$manifest" --workers 4
+rm "$manifest" 
\ No newline at end of file
@@ -1,8 +1,13 @@
 # run the k-means algo for k = [3..10]
+manifest=$(mktemp)
 for i in {3..10}
 do  
     # run the k-means algo 
     npx ts-node --esm src/prod/run-kmeans_qfi_data.ts $i
-    # plot the number of ballots x cluster
-    python3 src/prod/plot_sizes.py $i
-done 
\ No newline at end of file
+    # queue the plot of the number of ballots x cluster
+    echo "{\"script\": \"src/prod/plot_sizes.py\", \"args\": [$i]}" >> "$manifest"
+done
+
+# render every plot in a single python process
+python3 src/plotting/batch_render.py "$manifest" --workers 4
+rm "$manifest" 
\ No newline at end of file